@@ -12,5 +12,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from recipe.sse import EVENTS_PATH, sse_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # The event stream is served outside Django so idle connections
+    # do not hold a thread each
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        await sse_application(scope, receive, send)
+        return
+
+    await django_application(scope, receive, send)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -58,6 +59,10 @@ INSTALLED_APPS = [
 ] + APPS
 
 MIDDLEWARE = [
+    'core.metrics.PrometheusMiddleware',
+    'core.throttling.LoadSheddingMiddleware',
+    'core.timing.ServerTimingMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -99,9 +104,72 @@ DATABASES = {
         'PASSWORD': os.environ.get("DB_PASS"),
         'HOST': os.environ.get("DB_HOST"),
         'PORT': os.environ.get("DB_POST"),
+        # Seconds a thread keeps its connection open between requests
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# In-process connection pool shared by the threads of a worker
+if int(os.environ.get('DB_POOL', 0)):
+    DATABASES['default'].update({
+        'ENGINE': 'core.db.backends.postgresql',
+        # Connections go back to the pool at the end of each request
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_LIFETIME': int(os.environ.get('DB_POOL_MAX_LIFETIME', 1800)),
+            'TIMEOUT': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # Idle seconds after which a checkout pings the connection
+            'CHECK_IDLE': int(os.environ.get('DB_POOL_CHECK_IDLE', 1)),
+        },
+    })
+
+TESTING = sys.argv[1:2] == ['test']
+
+# Read replicas, comma separated hosts sharing the primary's credentials
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))
+):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+if TESTING:
+    # Routing is off in tests unless a test enables it for this alias
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = []
+
+# Shared by all workers when CACHE_URL points at Redis, otherwise each
+# process has its own
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if os.environ.get('CACHE_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_URL'],
+    }
+
+DATABASE_ROUTERS = ['core.db.router.PrimaryReplicaRouter']
+# Needs a cache shared by all workers to hold across processes
+DATABASE_REPLICA_STICKY_SECONDS = int(
+    os.environ.get('DB_REPLICA_STICKY_SECONDS', 5)
+)
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DATABASE_REPLICA_CHECK_INTERVAL = int(
+    os.environ.get('DB_REPLICA_CHECK_INTERVAL', 10)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -154,8 +222,164 @@ AUTH_USER_MODEL = "core.User"
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Token buckets in the default cache, see core.throttling
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserTokenBucketThrottle',
+        'core.throttling.ActionTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_USER_RATE', '600/min'),
+        'recipe_create': os.environ.get(
+            'THROTTLE_RECIPE_CREATE_RATE', '60/min'
+        ),
+        'recipe_upload': os.environ.get(
+            'THROTTLE_RECIPE_UPLOAD_RATE', '20/min'
+        ),
+    },
 }
+if TESTING:
+    # Tests that exercise throttling set their own rates
+    REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] = {}
+
+# Load shedding, 503 once uwsgi's listen queue (UWSGI_LISTEN long) holds
+# LOAD_SHED_QUEUE_DEPTH connections or, mostly for ASGI, a process has
+# LOAD_SHED_MAX_IN_FLIGHT requests in progress. 0 turns a check off.
+LOAD_SHED_QUEUE_DEPTH = int(os.environ.get(
+    'LOAD_SHED_QUEUE_DEPTH', int(os.environ.get('UWSGI_LISTEN', 100)) * 4 // 5
+))
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', 0))
+LOAD_SHED_RETRY_AFTER = int(os.environ.get('LOAD_SHED_RETRY_AFTER', 2))
+LOAD_SHED_EXEMPT_PATHS = ['/metrics', '/api/health/db-pool/']
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True, 
-} # for uploading images
\ No newline at end of file
+} # for uploading images
+
+# Similar recipes index
+RECIPE_SIMILARITY_INDEX_TTL = int(
+    os.environ.get('RECIPE_SIMILARITY_INDEX_TTL', 300)
+)
+RECIPE_SIMILARITY_INDEX_MAX_ENTRIES = int(
+    os.environ.get('RECIPE_SIMILARITY_INDEX_MAX_ENTRIES', 500000)
+)
+
+# Delta sync
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', 500))
+SYNC_MAX_PAGE_SIZE = int(os.environ.get('SYNC_MAX_PAGE_SIZE', 1000))
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 2))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(
+    os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 90)
+)
+
+# Rows deleted per transaction when a deleted user's data is purged
+USER_PURGE_CHUNK_SIZE = int(os.environ.get('USER_PURGE_CHUNK_SIZE', 1000))
+
+# Seconds a stored Idempotency-Key response is replayed, see core.idempotency
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+# Change events
+RECIPE_EVENTS_BROKER = os.environ.get(
+    'RECIPE_EVENTS_BROKER', 'recipe.events.PostgresBroker'
+)
+RECIPE_EVENTS_QUEUE_SIZE = int(os.environ.get('RECIPE_EVENTS_QUEUE_SIZE', 100))
+RECIPE_EVENTS_HEARTBEAT = int(os.environ.get('RECIPE_EVENTS_HEARTBEAT', 15))
+# Seconds a ?token= issued by /api/recipe/stream-token/ can open a stream
+RECIPE_EVENTS_TOKEN_MAX_AGE = int(
+    os.environ.get('RECIPE_EVENTS_TOKEN_MAX_AGE', 60)
+)
+
+# Async views, enabled by app/asgi.py
+ASYNC_VIEWS = bool(int(os.environ.get('ASYNC_VIEWS', 0)))
+ASYNC_THREAD_POOLS = {
+    'db': int(os.environ.get('ASYNC_DB_THREADS', 8)),
+    'image': int(os.environ.get('ASYNC_IMAGE_THREADS', 2)),
+}
+
+# Request timings, sent as Server-Timing headers and logged by core.timing
+SERVER_TIMING_SAMPLE_RATE = float(
+    os.environ.get('SERVER_TIMING_SAMPLE_RATE', 0 if TESTING else 1)
+)
+
+# Slow query log, summarized by `manage.py slow_queries`
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1)
+)
+SLOW_QUERY_EXPLAIN_INTERVAL = int(
+    os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', 300)
+)
+SLOW_QUERY_LOG_FILE = os.environ.get(
+    'SLOW_QUERY_LOG_FILE', '/vol/log/slow_queries.log'
+)
+
+# Per-view query budgets, reported by `manage.py query_budgets`
+QUERY_BUDGET_RAISE = bool(int(
+    os.environ.get('QUERY_BUDGET_RAISE', int(DEBUG or TESTING))
+))
+QUERY_BUDGET_SAMPLE_RATE = float(
+    os.environ.get('QUERY_BUDGET_SAMPLE_RATE', 0 if TESTING else 0.05)
+)
+QUERY_BUDGET_LOG_FILE = os.environ.get(
+    'QUERY_BUDGET_LOG_FILE', '/vol/log/query_budgets.log'
+)
+
+# On-demand request profiles for staff users, see core.profiling
+PROFILER_DIR = os.environ.get('PROFILER_DIR', '/vol/profiles')
+PROFILER_RATE_LIMIT = int(os.environ.get('PROFILER_RATE_LIMIT', 6))
+PROFILER_MAX_BYTES = int(
+    os.environ.get('PROFILER_MAX_BYTES', 200 * 1024 * 1024)
+)
+PROFILER_SAMPLE_INTERVAL = float(
+    os.environ.get('PROFILER_SAMPLE_INTERVAL', 0.001)
+)
+PROFILER_MAX_SAMPLES = int(os.environ.get('PROFILER_MAX_SAMPLES', 60000))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('SERVER_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'core.slow_queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.query_budget': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+if not TESTING and os.path.isdir(os.path.dirname(SLOW_QUERY_LOG_FILE)):
+    LOGGING['handlers']['slow_queries_file'] = {
+        'class': 'logging.handlers.RotatingFileHandler',
+        'filename': SLOW_QUERY_LOG_FILE,
+        'formatter': 'message',
+        'maxBytes': 10 * 1024 * 1024,
+        'backupCount': 5,
+        'delay': True,
+    }
+    LOGGING['loggers']['core.slow_queries']['handlers'] = ['slow_queries_file']
+
+if not TESTING and os.path.isdir(os.path.dirname(QUERY_BUDGET_LOG_FILE)):
+    LOGGING['handlers']['query_budget_file'] = {
+        'class': 'logging.handlers.RotatingFileHandler',
+        'filename': QUERY_BUDGET_LOG_FILE,
+        'formatter': 'message',
+        'maxBytes': 10 * 1024 * 1024,
+        'backupCount': 5,
+        'delay': True,
+    }
+    LOGGING['loggers']['core.query_budget']['handlers'] = ['query_budget_file']
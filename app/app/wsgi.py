@@ -7,10 +7,20 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# uwsgi loads this module in the master and forks the workers from it.
+# Importing the URLconf (and with it every view and serializer) here
+# instead of on each worker's first request, then moving everything
+# loaded so far out of the garbage collector's reach, keeps those pages
+# shared copy-on-write between the workers
+get_resolver().url_patterns
+gc.freeze()
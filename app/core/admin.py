@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from user.deletion import request_deletion
 
 
 class UserAdmin(BaseUserAdmin):
@@ -20,9 +21,12 @@ class UserAdmin(BaseUserAdmin):
                 )
             }
         ),
-        (_('Important dates'), {'fields': ('last_login', )})
+        (
+            _('Important dates'),
+            {'fields': ('last_login', 'deletion_requested_at')},
+        )
     )
-    readonly_fields = ['last_login', ]
+    readonly_fields = ['last_login', 'deletion_requested_at']
     add_fieldsets = (
         (None, {
             'classes': ('wide', ),
@@ -38,6 +42,22 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    def get_deleted_objects(self, objs, request):
+        # The default collects every recipe, tag and ingredient to list them
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(self.opts.verbose_name)
+        model_count = {self.opts.verbose_name_plural: len(objs)}
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    # Users are disabled at once and purged in chunks, see user.deletion
+    def delete_model(self, request, obj):
+        request_deletion(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            request_deletion(user)
+
 
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Recipe)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from core.metrics import install_query_observer
+        from core.slow_queries import install_slow_query_log
+
+        connection_created.connect(install_query_observer)
+        connection_created.connect(install_slow_query_log)
@@ -0,0 +1,293 @@
+"""
+Benchmark datasets and workloads for the recipe API.
+
+seed_dataset() creates users through core.seeding, with recipe counts
+spread log-uniformly between a minimum and a maximum and tags and
+ingredients picked from a Zipf distribution so a few are very common and
+most are rare. run() replays a weighted mix of requests through the
+URL routes, middleware and views in-process, and reports throughput,
+latency percentiles and queries per request. Everything is drawn from
+seeded generators, so two runs with the same options send the same
+requests.
+"""
+import io
+import random
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import seeding
+from core.models import Ingredient, Recipe, Tag
+from core.query_budget import QueryCounter
+
+
+EMAIL_DOMAIN = 'bench.example.com'
+
+WORKLOADS = ['list', 'detail', 'create', 'upload']
+
+
+def bench_users():
+    return get_user_model().objects.filter(
+        email__endswith=f'@{EMAIL_DOMAIN}'
+    ).order_by('id')
+
+
+def zipf_weights(count, exponent):
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def pick(rng, population, weights, count):
+    # Distinct items, drawn with the given weights
+    chosen = dict.fromkeys(rng.choices(population, weights, k=count * 2))
+    return list(chosen)[:count]
+
+
+def seed_dataset(users, min_recipes, max_recipes, tags, ingredients,
+                 exponent, seed):
+    return seeding.generate(
+        users,
+        (min_recipes, max_recipes),
+        tags,
+        ingredients,
+        distribution='loguniform',
+        zipf=exponent,
+        seed=seed,
+        email_domain=EMAIL_DOMAIN,
+        password_hash=make_password('benchpass'),
+    )
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def _jpeg():
+    image = io.BytesIO()
+    Image.new('RGB', (64, 64)).save(image, format='JPEG')
+    return image.getvalue()
+
+
+class UserData:
+    """IDs of a bench user's rows, with their Zipf weights."""
+
+    def __init__(self, user, exponent):
+        self.user = user
+        self.recipe_ids = list(Recipe.objects.filter(
+            user=user
+        ).order_by('id').values_list('id', flat=True))
+        self.tag_ids = list(Tag.objects.filter(
+            user=user
+        ).order_by('id').values_list('id', flat=True))
+        self.ingredient_ids = list(Ingredient.objects.filter(
+            user=user
+        ).order_by('id').values_list('id', flat=True))
+        self.tag_weights = zipf_weights(len(self.tag_ids), exponent)
+        self.ingredient_weights = zipf_weights(
+            len(self.ingredient_ids), exponent
+        )
+
+
+class Worker:
+    def __init__(self, users, mix, seed):
+        self.users = users
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.rng = random.Random(seed)
+        self.client = APIClient()
+        self.image = _jpeg()
+        self.samples = []
+        # user id -> IDs of the recipes this worker created
+        self.created = {}
+
+    def _list(self, data):
+        params = {'tags': ','.join(map(str, pick(
+            self.rng, data.tag_ids, data.tag_weights, self.rng.randint(1, 2)
+        )))}
+        if self.rng.random() < 0.5:
+            params['ingredients'] = ','.join(map(str, pick(
+                self.rng, data.ingredient_ids, data.ingredient_weights, 1
+            )))
+        return self.client.get(reverse('recipe:recipe-list'), params)
+
+    def _detail(self, data):
+        recipe_id = self.rng.choice(data.recipe_ids)
+        return self.client.get(
+            reverse('recipe:recipe-detail', args=[recipe_id])
+        )
+
+    def _create(self, data):
+        tags = pick(
+            self.rng, range(len(data.tag_ids)), data.tag_weights, 2
+        )
+        payload = {
+            'title': 'Bench recipe',
+            'time_minutes': self.rng.randint(5, 180),
+            'price': f'{self.rng.uniform(1, 100):.2f}',
+            'tags': [{'name': f'tag-{rank}'} for rank in tags],
+            'ingredients': [
+                {'name': f'ingredient-{rank}'} for rank in pick(
+                    self.rng,
+                    range(len(data.ingredient_ids)),
+                    data.ingredient_weights,
+                    1,
+                )
+            ],
+        }
+        response = self.client.post(
+            reverse('recipe:recipe-list'), payload, format='json'
+        )
+        if response.status_code == 201:
+            self.created.setdefault(data.user.id, []).append(
+                response.data['id']
+            )
+        return response
+
+    def _upload(self, data):
+        # Images go on recipes created by the run, the seeded ones stay
+        # as they are for the next run
+        created = self.created.get(data.user.id)
+        if created:
+            recipe_id = self.rng.choice(created)
+        else:
+            response = self._create(data)
+            if response.status_code != 201:
+                # Counted as a failed upload
+                return response
+            recipe_id = response.data['id']
+        image = SimpleUploadedFile(
+            'bench.jpg', self.image, content_type='image/jpeg'
+        )
+        return self.client.post(
+            reverse('recipe:recipe-upload-image', args=[recipe_id]),
+            {'image': image},
+            format='multipart',
+        )
+
+    def request(self, counter):
+        data = self.rng.choice(self.users)
+        name = self.rng.choices(self.names, self.weights)[0]
+        self.client.force_authenticate(data.user)
+
+        queries = counter.queries
+        start = time.perf_counter()
+        response = getattr(self, f'_{name}')(data)
+        seconds = time.perf_counter() - start
+
+        return name, seconds, counter.queries - queries, response.status_code
+
+    def run(self, count, warmup, ready=None):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter)
+                )
+            for _ in range(warmup):
+                self.request(counter)
+            if ready is not None:
+                ready.wait()
+            for _ in range(count):
+                self.samples.append(self.request(counter))
+
+
+def _summary(samples, seconds):
+    latencies = [sample[1] for sample in samples]
+    queries = [sample[2] for sample in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[3] >= 400),
+        'req_per_s': round(len(samples) / seconds, 2) if seconds else None,
+        'latency_ms': {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in [
+                ('p50', percentile(latencies, 50)),
+                ('p95', percentile(latencies, 95)),
+                ('p99', percentile(latencies, 99)),
+                ('mean', statistics.mean(latencies) if latencies else None),
+            ]
+        },
+        'queries': {
+            'mean': round(statistics.mean(queries), 2) if queries else None,
+            'max': max(queries, default=None),
+        },
+    }
+
+
+def run(users, mix, requests, concurrency, warmup, exponent, seed):
+    # Returns the report and the IDs of the recipes the run created
+    datasets = [UserData(user, exponent) for user in users]
+    workers = [
+        Worker(datasets, mix, seed + index)
+        for index in range(concurrency)
+    ]
+    counts = [
+        requests // concurrency + (index < requests % concurrency)
+        for index in range(concurrency)
+    ]
+
+    # The clock starts once every worker has finished its warmup
+    ready = threading.Barrier(concurrency + 1)
+
+    def work(worker, count):
+        try:
+            worker.run(count, warmup, ready)
+        except BaseException:
+            ready.abort()
+            raise
+        finally:
+            connections.close_all()
+
+    if concurrency == 1:
+        # In the calling thread, so it sees the caller's transaction
+        workers[0].run(0, warmup)
+        start = time.perf_counter()
+        workers[0].run(counts[0], 0)
+    else:
+        threads = [
+            threading.Thread(target=work, args=(worker, count))
+            for worker, count in zip(workers, counts)
+        ]
+        for thread in threads:
+            thread.start()
+        ready.wait()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - start
+
+    samples = [sample for worker in workers for sample in worker.samples]
+    report = {
+        'concurrency': concurrency,
+        'warmup': warmup,
+        'seed': seed,
+        'duration_s': round(seconds, 3),
+        'overall': _summary(samples, seconds),
+        'workloads': {
+            name: _summary(
+                [sample for sample in samples if sample[0] == name], seconds
+            )
+            for name in mix
+        },
+    }
+    created = [
+        pk
+        for worker in workers
+        for recipe_ids in worker.created.values()
+        for pk in recipe_ids
+    ]
+
+    return report, created
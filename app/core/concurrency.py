@@ -0,0 +1,65 @@
+"""
+Bounded thread pools for running blocking work from async views.
+
+Each pool has a fixed number of threads, so under ASGI the number of
+concurrent ORM or Pillow calls is capped while slow clients only cost
+a suspended coroutine.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def get_executor(pool):
+    with _lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.ASYNC_THREAD_POOLS[pool],
+                thread_name_prefix=f'{pool}-pool',
+            )
+            _executors[pool] = executor
+
+    return executor
+
+
+def _call(func, args, kwargs):
+    # Pool threads keep their own DB connection, honour CONN_MAX_AGE
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_blocking(pool, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    # Carry the request's context variables over to the pool thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(pool), context.run, _call, func, args, kwargs
+    )
+
+
+def async_view(view, pool='db'):
+    # Wraps a sync view so that it runs, including rendering, in a pool
+    def call(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_blocking(pool, call, request, *args, **kwargs)
+
+    return wrapper
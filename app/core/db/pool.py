@@ -0,0 +1,252 @@
+"""
+In-process pool of psycopg2 connections shared by a worker's threads.
+
+Connections are health checked when they are checked out after sitting
+idle, and replaced once they reach their maximum lifetime. A pool is
+kept per set of connection parameters and is reset in forked children,
+which must not reuse their parent's sockets.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+def connect(conn_params):
+    connection = psycopg2.connect(**conn_params)
+    # As Django's backend does, skip decoding jsonb twice
+    psycopg2.extras.register_default_jsonb(
+        conn_or_curs=connection, loads=lambda x: x
+    )
+    return connection
+
+
+class ConnectionPool:
+    def __init__(self, conn_params, max_size=10, max_lifetime=1800,
+                 timeout=10, check_idle=1, connect=connect):
+        self.conn_params = conn_params
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._connect = connect
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # (connection, expires at, idle since), most recently used last
+        self._idle = deque()
+        self._expires = {}
+        self._size = 0
+        self._waiting = 0
+        self._counters = dict.fromkeys([
+            'checkouts', 'connections_created', 'connections_closed',
+            'health_check_failures', 'timeouts',
+        ], 0)
+        self._wait_seconds = 0.0
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # Closing the parent's connections would end its sessions
+            self._reset()
+
+    def _discard(self, connection):
+        self._size -= 1
+        self._counters['connections_closed'] += 1
+        self._expires.pop(id(connection), None)
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def _usable(self, connection, expires_at, idle_since):
+        now = time.monotonic()
+        if connection.closed or now >= expires_at:
+            return False
+
+        if now - idle_since < self.check_idle:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            with self._cond:
+                self._counters['health_check_failures'] += 1
+            return False
+
+        return True
+
+    def _reserve(self, start):
+        # Returns an idle entry, or None once a slot for a new connection
+        # has been reserved
+        deadline = start + self.timeout
+
+        with self._cond:
+            self._check_fork()
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f'No connection available within {self.timeout}s '
+                        f'(max_size={self.max_size}).'
+                    )
+
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def getconn(self):
+        start = time.monotonic()
+
+        while True:
+            entry = self._reserve(start)
+            if entry is None:
+                break
+
+            # The health check runs outside the lock
+            if self._usable(*entry):
+                with self._cond:
+                    self._checked_out(start)
+                return entry[0]
+
+            with self._cond:
+                self._discard(entry[0])
+                self._cond.notify()
+
+        try:
+            connection = self._connect(self.conn_params)
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        # Spread replacements so connections opened together do not expire
+        # together
+        lifetime = self.max_lifetime * random.uniform(0.9, 1.0)
+        with self._cond:
+            self._expires[id(connection)] = time.monotonic() + lifetime
+            self._counters['connections_created'] += 1
+            self._checked_out(start)
+
+        return connection
+
+    def _checked_out(self, start):
+        self._counters['checkouts'] += 1
+        self._wait_seconds += time.monotonic() - start
+
+    def putconn(self, connection):
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+
+            status = None
+            if not connection.closed:
+                status = connection.get_transaction_status()
+                if status in (
+                    psycopg2.extensions.TRANSACTION_STATUS_INTRANS,
+                    psycopg2.extensions.TRANSACTION_STATUS_INERROR,
+                ):
+                    try:
+                        connection.rollback()
+                        status = connection.get_transaction_status()
+                    except psycopg2.Error:
+                        status = None
+
+            now = time.monotonic()
+            expires_at = self._expires.get(id(connection), now)
+            if (
+                status == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+                and now < expires_at
+            ):
+                self._idle.append((connection, expires_at, now))
+            else:
+                self._discard(connection)
+
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._check_fork()
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+    def stats(self):
+        with self._cond:
+            self._check_fork()
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'waiting': self._waiting,
+                'wait_seconds': round(self._wait_seconds, 6),
+                **self._counters,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_key(conn_params):
+    return tuple(sorted(
+        (name, str(value)) for name, value in conn_params.items()
+    ))
+
+
+def get_pool(conn_params, options=None):
+    key = _pool_key(conn_params)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(conn_params, **{
+                name.lower(): value
+                for name, value in (options or {}).items()
+            })
+            _pools[key] = pool
+
+    return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    return [
+        {
+            'host': pool.conn_params.get('host'),
+            'database': pool.conn_params.get('database'),
+            **pool.stats(),
+        }
+        for pool in pools
+    ]
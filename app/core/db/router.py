@@ -0,0 +1,146 @@
+"""
+Routes reads made by the API views to the read replicas.
+
+Only views using ReplicaReadMixin read from a replica, and only for safe
+methods. A user who wrote recently keeps reading from the primary for
+DATABASE_REPLICA_STICKY_SECONDS so they see their own changes, and a
+replica that is unreachable or lagging is skipped until it is checked
+again.
+"""
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+
+PRIMARY = 'default'
+
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+# alias -> (healthy, next check)
+_health = {}
+
+LAG_SQL = '''
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+'''
+
+
+def _replica_lag(alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        return cursor.fetchone()[0]
+
+
+def replica_is_healthy(alias):
+    now = time.monotonic()
+    healthy, next_check = _health.get(alias, (True, 0))
+    if now < next_check:
+        return healthy
+
+    try:
+        healthy = _replica_lag(alias) <= settings.DATABASE_REPLICA_MAX_LAG
+    except DatabaseError:
+        connections[alias].close()
+        healthy = False
+
+    _health[alias] = (healthy, now + settings.DATABASE_REPLICA_CHECK_INTERVAL)
+    return healthy
+
+
+def mark_unhealthy(alias):
+    _health[alias] = (
+        False, time.monotonic() + settings.DATABASE_REPLICA_CHECK_INTERVAL
+    )
+
+
+def reset_health():
+    _health.clear()
+
+
+def _sticky_key(user_id):
+    return f'db:recent-write:{user_id}'
+
+
+def mark_recent_write(user_id):
+    cache.set(
+        _sticky_key(user_id), True, settings.DATABASE_REPLICA_STICKY_SECONDS
+    )
+
+
+def has_recent_write(user_id):
+    return cache.get(_sticky_key(user_id), False)
+
+
+def choose_replica():
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if replica_is_healthy(alias):
+            return alias
+
+    return None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # Anything read later in the same request must see this write
+        _read_alias.set(None)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaReadMixin:
+    """Serve safe-method requests of the view from a read replica."""
+
+    _read_alias_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Exceptions handle_exception re-raises skip finalize_response,
+            # and the worker thread would keep reading from the replica
+            if self._read_alias_token is not None:
+                _read_alias.reset(self._read_alias_token)
+                self._read_alias_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        user_id = request.user.pk
+        if (
+            request.method in SAFE_METHODS
+            and settings.DATABASE_REPLICAS
+            and not (user_id and has_recent_write(user_id))
+        ):
+            self._read_alias_token = _read_alias.set(choose_replica())
+
+    def handle_exception(self, exc):
+        alias = _read_alias.get()
+        if alias is not None and isinstance(exc, DatabaseError):
+            mark_unhealthy(alias)
+
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if request.method not in SAFE_METHODS and request.user.pk:
+            mark_recent_write(request.user.pk)
+
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,128 @@
+"""
+Idempotency-Key support for actions that create or change objects.
+
+A client that retries a request with the same Idempotency-Key header
+gets the response of its first attempt again, marked with an
+Idempotent-Replayed header, instead of a second recipe. Keys belong to
+the user and are kept for IDEMPOTENCY_KEY_TTL seconds.
+
+The key's row is inserted in the transaction that runs the action, so a
+duplicate that arrives while the first attempt is still running waits
+on the unique index. Once the first attempt commits the duplicate
+replays its response; if it rolled back, the duplicate runs instead.
+Only successful responses are stored, a key whose request failed can be
+retried.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def _encode(value):
+    if isinstance(value, File):
+        digest = hashlib.sha256()
+        for chunk in value.chunks():
+            digest.update(chunk)
+        value.seek(0)
+        return digest.hexdigest()
+
+    return str(value)
+
+
+def fingerprint(request):
+    # Same method, path and data, uploaded files compared by content
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    body = json.dumps(data, sort_keys=True, default=_encode)
+
+    return hashlib.sha256(
+        f'{request.method} {request.path}\n{body}'.encode()
+    ).hexdigest()
+
+
+def claim(user_id, key, request_fingerprint):
+    """
+    Insert the key's row, returning None, or return the stored key when
+    an earlier request committed it. Must run in a transaction.
+    """
+    table = IdempotencyKey._meta.db_table
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    with connection.cursor() as cursor:
+        # Also frees this key if it expired
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s AND created_at < %s',
+            [user_id, expired],
+        )
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, key, fingerprint, created_at) '
+            f'VALUES (%s, %s, %s, %s) '
+            f'ON CONFLICT (user_id, key) DO NOTHING RETURNING id',
+            [user_id, key, request_fingerprint, now],
+        )
+        if cursor.fetchone() is not None:
+            return None
+
+    # Locking reads go to the primary, the row may be seconds old
+    return IdempotencyKey.objects.select_for_update().get(
+        user_id=user_id, key=key
+    )
+
+
+def idempotent(action):
+    """Make a view action honour the Idempotency-Key header."""
+
+    @functools.wraps(action)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if key is None:
+            return action(view, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({'Idempotency-Key': [
+                f'Must be 1 to {MAX_KEY_LENGTH} characters long.'
+            ]})
+
+        request_fingerprint = fingerprint(request)
+        with transaction.atomic():
+            stored = claim(request.user.id, key, request_fingerprint)
+            if stored is not None:
+                if stored.fingerprint != request_fingerprint:
+                    return Response(
+                        {'detail': 'Idempotency-Key was already used for '
+                                   'a different request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+                response = Response(
+                    stored.response, status=stored.status_code
+                )
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = action(view, request, *args, **kwargs)
+            if not status.is_success(response.status_code):
+                transaction.set_rollback(True)
+                return response
+
+            IdempotencyKey.objects.filter(
+                user_id=request.user.id, key=key
+            ).update(status_code=response.status_code, response=response.data)
+
+        return response
+
+    return wrapper
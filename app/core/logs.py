@@ -0,0 +1,26 @@
+"""Reading the JSON line logs written by core.slow_queries and friends."""
+import glob
+import json
+import os
+
+
+def rotated_paths(path):
+    # Rotated files are path.1 (newest) to path.N, read oldest first
+    rotated = [
+        name for name in glob.glob(f'{glob.escape(path)}.*')
+        if name.rsplit('.', 1)[1].isdigit()
+    ]
+    rotated.sort(key=lambda name: int(name.rsplit('.', 1)[1]))
+    return rotated[::-1] + [path]
+
+
+def read_entries(paths):
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path) as log:
+            for line in log:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
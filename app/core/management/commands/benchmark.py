@@ -0,0 +1,157 @@
+import json
+import os
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from core import benchmark
+from core.models import Ingredient, Recipe, Tag
+from user.deletion import purge_user
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in benchmark.WORKLOADS:
+            raise CommandError(
+                f'Unknown workload {name!r}, expected one of '
+                f'{", ".join(benchmark.WORKLOADS)}'
+            )
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name!r}: {weight!r}')
+
+    return mix
+
+
+def git_commit():
+    if os.environ.get('GIT_COMMIT'):
+        return os.environ['GIT_COMMIT']
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a benchmark dataset and replay a mix of API requests, '
+        'reporting throughput, latency percentiles and queries per request '
+        'as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Replace the benchmark users with a freshly seeded dataset.',
+        )
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--min-recipes', type=int, default=10)
+        parser.add_argument('--max-recipes', type=int, default=100000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=200)
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Exponent of the tag and ingredient popularity.',
+        )
+        parser.add_argument('--random-seed', type=int, default=42)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=50)
+        parser.add_argument(
+            '--mix',
+            type=parse_mix,
+            default='list=40,detail=40,create=15,upload=5',
+            help='Comma separated workload=weight pairs.',
+        )
+        parser.add_argument('--output', help='Write the report to this file.')
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the recipes created by the run.',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            # The ORM collector would load every recipe of the old dataset
+            # and run the recipe signal handlers on each
+            for user_id in benchmark.bench_users().values_list(
+                'id', flat=True
+            ):
+                purge_user(user_id)
+            benchmark.seed_dataset(
+                options['users'],
+                options['min_recipes'],
+                options['max_recipes'],
+                options['tags'],
+                options['ingredients'],
+                options['zipf'],
+                options['random_seed'],
+            )
+
+        users = list(benchmark.bench_users())
+        if not users:
+            raise CommandError('No benchmark users, run with --seed first.')
+        if settings.DEBUG:
+            self.stderr.write(self.style.WARNING(
+                'DEBUG is on, every query is logged and timings are inflated.'
+            ))
+
+        # Uploaded images go to a directory that is removed afterwards.
+        # Throttling is off, a 429 would count as an error and a bench
+        # user's request rate is not a client's
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            MEDIA_ROOT=media_root,
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {},
+            },
+            QUERY_BUDGET_RAISE=False,
+            QUERY_BUDGET_SAMPLE_RATE=0,
+            SERVER_TIMING_SAMPLE_RATE=0,
+        ):
+            report, created = benchmark.run(
+                users,
+                options['mix'],
+                options['requests'],
+                options['concurrency'],
+                options['warmup'],
+                options['zipf'],
+                options['random_seed'],
+            )
+            if not options['keep']:
+                Recipe.objects.filter(id__in=created).delete()
+
+        report = {
+            'commit': git_commit(),
+            'dataset': {
+                'users': len(users),
+                'recipes': Recipe.objects.filter(user__in=users).count(),
+                'tags': Tag.objects.filter(user__in=users).count(),
+                'ingredients': Ingredient.objects.filter(
+                    user__in=users
+                ).count(),
+                'zipf': options['zipf'],
+            },
+            'mix': options['mix'],
+            **report,
+        }
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output + '\n')
+        self.stdout.write(output)
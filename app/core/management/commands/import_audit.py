@@ -0,0 +1,129 @@
+import os
+import resource
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class ImportNode:
+    def __init__(self, name, self_us, cumulative_us):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children = []
+
+
+def parse_importtime(output):
+    # -X importtime prints a module after the modules it imported, indented
+    # two spaces per level, so children are collected until their parent
+    pending = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|', 2)
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except (IndexError, ValueError):
+            continue  # the header line
+
+        name = parts[2][1:]
+        level = (len(name) - len(name.lstrip())) // 2
+        node = ImportNode(name.strip(), self_us, cumulative_us)
+        node.children = pending.pop(level + 1, [])
+        pending.setdefault(level, []).append(node)
+
+    return pending.get(0, [])
+
+
+class Command(BaseCommand):
+    help = (
+        'Import a module in a fresh interpreter with -X importtime and print '
+        'its cumulative import tree.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='app.wsgi')
+        parser.add_argument('--depth', type=int, default=3)
+        parser.add_argument(
+            '--min-ms',
+            type=float,
+            default=5,
+            help='Hide imports that took less than this, self included.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of top-level packages to rank by self time.',
+        )
+
+    def _write_tree(self, node, depth, max_depth, min_us):
+        self.stdout.write(
+            f'{node.cumulative_us / 1000:9.1f}ms  {"  " * depth}{node.name}'
+        )
+        if depth + 1 >= max_depth:
+            return
+        for child in sorted(
+            node.children, key=lambda child: child.cumulative_us, reverse=True
+        ):
+            if child.cumulative_us >= min_us:
+                self._write_tree(child, depth + 1, max_depth, min_us)
+
+    def _walk(self, nodes):
+        for node in nodes:
+            yield node
+            yield from self._walk(node.children)
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'app.settings'
+            ),
+        }
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             f'import {options["module"]}'],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(
+                f'Importing {options["module"]} failed:\n{result.stderr}'
+            )
+        max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+        roots = parse_importtime(result.stderr)
+        module = next(
+            (node for node in roots if node.name == options['module']), None
+        )
+        if module is None:
+            raise CommandError(
+                f'No import time recorded for {options["module"]}'
+            )
+
+        self._write_tree(
+            module, 0, options['depth'], options['min_ms'] * 1000
+        )
+
+        packages = Counter()
+        for node in self._walk(roots):
+            packages[node.name.split('.')[0]] += node.self_us
+
+        self.stdout.write('')
+        self.stdout.write('Self time by top-level package:')
+        for package, self_us in packages.most_common(options['top']):
+            self.stdout.write(f'{self_us / 1000:9.1f}ms  {package}')
+
+        total = sum(node.cumulative_us for node in roots)
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["module"]}: {module.cumulative_us / 1000:.1f}ms, '
+            f'all imports {total / 1000:.1f}ms, '
+            f'max RSS {max_rss / 1024:.1f}MB'
+        ))
@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from user.deletion import pending_user_ids, purge_user
+
+
+class Command(BaseCommand):
+    help = (
+        'Purge the data of users whose deletion was requested, resuming '
+        'purges that were interrupted. With --interval, keep checking for '
+        'new deletion requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows deleted per transaction, USER_PURGE_CHUNK_SIZE by '
+                 'default.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            help='Run forever, checking for pending users every INTERVAL '
+                 'seconds.',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            user_ids = self.purge(options['chunk_size'])
+            if user_ids or interval is None:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Purged {len(user_ids)} user(s)'
+                ))
+            if interval is None:
+                return
+            if not user_ids:
+                time.sleep(interval)
+            # Between passes, as a request would, so a looping purger
+            # drops broken or expired connections
+            close_old_connections()
+
+    def purge(self, chunk_size):
+        user_ids = pending_user_ids()
+        for user_id in user_ids:
+            start = time.perf_counter()
+            counts = purge_user(user_id, chunk_size)
+            deleted = ', '.join(
+                f'{count} {name}' for name, count in counts.items()
+            )
+            self.stdout.write(
+                f'user {user_id}: {deleted} in '
+                f'{time.perf_counter() - start:.2f}s'
+            )
+
+        return user_ids
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import URLResolver, get_resolver
+
+from core.logs import read_entries, rotated_paths
+from core.query_budget import QueryBudgetMixin
+
+
+class Command(BaseCommand):
+    help = 'Compare the query counts logged for each endpoint with its budget.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.QUERY_BUDGET_LOG_FILE)
+        parser.add_argument(
+            '--over',
+            action='store_true',
+            help='Only list endpoints that went over their budget.',
+        )
+
+    def _endpoints(self, patterns):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from self._endpoints(pattern.url_patterns)
+                continue
+
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is None or not issubclass(
+                view_class, QueryBudgetMixin
+            ):
+                continue
+
+            # Viewsets map methods to actions, API views use the method
+            actions = getattr(pattern.callback, 'actions', None) or {
+                method: method for method in view_class.http_method_names
+                if method != 'options' and hasattr(view_class, method)
+            }
+            for action in actions.values():
+                yield (
+                    f'{view_class.__name__}.{action}',
+                    view_class.query_budgets.get(action),
+                )
+
+    def handle(self, *args, **options):
+        # Format suffix routes repeat the same views
+        endpoints = dict(self._endpoints(get_resolver().url_patterns))
+
+        stats = {}
+        for entry in read_entries(rotated_paths(options['file'])):
+            stat = stats.setdefault(
+                entry['view'], {'count': 0, 'total': 0, 'max': 0}
+            )
+            stat['count'] += 1
+            stat['total'] += entry['queries']
+            stat['max'] = max(stat['max'], entry['queries'])
+
+        for name, budget in sorted(endpoints.items()):
+            stat = stats.get(name)
+            over = stat is not None and budget is not None and (
+                stat['max'] > budget
+            )
+            if options['over'] and not over:
+                continue
+
+            line = f'{name}  budget={"-" if budget is None else budget}  '
+            if stat is None:
+                self.stdout.write(line + 'samples=0')
+                continue
+
+            line += (
+                f'max={stat["max"]}  '
+                f'mean={stat["total"] / stat["count"]:.1f}  '
+                f'samples={stat["count"]}'
+            )
+            if over:
+                self.stdout.write(line, self.style.ERROR)
+            elif budget is not None:
+                self.stdout.write(line, self.style.SUCCESS)
+            else:
+                self.stdout.write(line)
@@ -0,0 +1,113 @@
+import argparse
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from core import seeding
+
+
+def parse_range(value):
+    low, _, high = value.partition(':')
+    try:
+        low = int(low)
+        high = int(high or low)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Expected LOW:HIGH, got {value!r}')
+    if not 0 <= low <= high:
+        raise argparse.ArgumentTypeError(f'Invalid range {value!r}')
+
+    return low, high
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate users, recipes, tags, ingredients and their links in bulk '
+        'with COPY.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument(
+            '--recipes',
+            type=parse_range,
+            default='10:1000',
+            help='Recipes per user, LOW:HIGH.',
+        )
+        parser.add_argument(
+            '--distribution',
+            choices=seeding.DISTRIBUTIONS,
+            default='loguniform',
+            help='How recipes per user are spread between LOW and HIGH.',
+        )
+        parser.add_argument(
+            '--shape',
+            type=float,
+            default=1.2,
+            help='Shape of the pareto distribution, lower is heavier tailed.',
+        )
+        parser.add_argument(
+            '--tags', type=int, default=50, help='Tags per user.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=200,
+            help='Ingredients per user.',
+        )
+        parser.add_argument(
+            '--tags-per-recipe', type=parse_range, default='1:4'
+        )
+        parser.add_argument(
+            '--ingredients-per-recipe', type=parse_range, default='3:10'
+        )
+        parser.add_argument(
+            '--zipf',
+            type=float,
+            default=1.1,
+            help='Exponent of the tag and ingredient popularity.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--email-domain', default='seed.example.com')
+        parser.add_argument(
+            '--keep-indexes',
+            action='store_true',
+            help='Keep indexes and constraints during the load, for '
+                 'adding a few rows to large tables.',
+        )
+        password = parser.add_mutually_exclusive_group()
+        password.add_argument(
+            '--password',
+            help='Password of every user, hashed once.',
+        )
+        password.add_argument(
+            '--password-hash',
+            help='Precomputed hash from make_password, used as is.',
+        )
+
+    def handle(self, *args, **options):
+        password_hash = options['password_hash']
+        if password_hash is None:
+            # Without a password the users cannot log in
+            password_hash = make_password(options['password'])
+
+        rows, seconds = seeding.generate(
+            options['users'],
+            options['recipes'],
+            options['tags'],
+            options['ingredients'],
+            tags_per_recipe=options['tags_per_recipe'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            distribution=options['distribution'],
+            shape=options['shape'],
+            zipf=options['zipf'],
+            seed=options['seed'],
+            email_domain=options['email_domain'],
+            password_hash=password_hash,
+            keep_indexes=options['keep_indexes'],
+        )
+
+        for name, count in rows.items():
+            self.stdout.write(f'{name}: {count}')
+        total = sum(rows.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {total} rows in {seconds:.1f}s '
+            f'({total / seconds if seconds else 0:.0f} rows/s)'
+        ))
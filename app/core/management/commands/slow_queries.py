@@ -0,0 +1,70 @@
+import os
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.logs import read_entries, rotated_paths
+
+
+class Command(BaseCommand):
+    help = 'Summarize the slow query log by SQL fingerprint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=settings.SLOW_QUERY_LOG_FILE)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--sort', choices=['total', 'max', 'count'], default='total'
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print the latest plan captured for each fingerprint.',
+        )
+
+    def handle(self, *args, **options):
+        paths = rotated_paths(options['file'])
+        stats = {}
+
+        for entry in read_entries(paths):
+            stat = stats.setdefault(entry['fingerprint'], {
+                'sql': entry['sql'],
+                'count': 0,
+                'total': 0,
+                'max': 0,
+                'views': Counter(),
+                'plan': None,
+            })
+            stat['count'] += 1
+            stat['total'] += entry['duration_ms']
+            stat['max'] = max(stat['max'], entry['duration_ms'])
+            stat['views'][entry.get('view') or '-'] += 1
+            if entry.get('plan'):
+                stat['plan'] = entry['plan']
+
+        if not stats:
+            if not any(os.path.exists(path) for path in paths):
+                raise CommandError(f'No slow query log at {options["file"]}')
+            self.stdout.write('No slow queries logged.')
+            return
+
+        worst = sorted(
+            stats.items(),
+            key=lambda item: item[1][options['sort']],
+            reverse=True,
+        )[:options['limit']]
+
+        for key, stat in worst:
+            views = ', '.join(
+                view for view, _ in stat['views'].most_common(3)
+            )
+            self.stdout.write(self.style.WARNING(
+                f'{key}  count={stat["count"]}  '
+                f'total={stat["total"]:.1f}ms  '
+                f'mean={stat["total"] / stat["count"]:.1f}ms  '
+                f'max={stat["max"]:.1f}ms  views={views}'
+            ))
+            self.stdout.write(f'    {stat["sql"]}')
+            if options['plans'] and stat['plan']:
+                for line in stat['plan'].splitlines():
+                    self.stdout.write(f'        {line}')
@@ -0,0 +1,82 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+
+import psycopg2
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Wait for the database, then migrate and collect static files '
+        'concurrently, skipping the steps that have nothing to do.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--db-timeout',
+            type=float,
+            default=60,
+            help='Seconds to wait for the database.',
+        )
+        parser.add_argument('--skip-static', action='store_true')
+        parser.add_argument('--skip-migrate', action='store_true')
+
+    def _step(self, name, func):
+        start = time.perf_counter()
+        output = StringIO()
+        try:
+            status = func(output) or 'done'
+        except startup.StepSkipped as skipped:
+            status = f'skipped, {skipped}'
+        finally:
+            # Steps run in their own threads and connections
+            connections.close_all()
+        seconds = time.perf_counter() - start
+
+        with self._lock:
+            self.timings.append((name, seconds, status))
+            if output.getvalue():
+                self.stdout.write(output.getvalue(), ending='')
+
+    def _database(self, timeout, skip_migrate):
+        def wait(output):
+            attempts = startup.wait_for_database(timeout)
+            return f'available after {attempts} attempt(s)'
+
+        try:
+            self._step('database', wait)
+        except psycopg2.OperationalError as error:
+            raise CommandError(f'Database unavailable: {error}')
+
+        if not skip_migrate:
+            self._step('migrate', startup.migrate)
+
+    def handle(self, *args, **options):
+        self._lock = threading.Lock()
+        self.timings = []
+        start = time.perf_counter()
+
+        # collectstatic does not need the database
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(
+                self._database, options['db_timeout'], options['skip_migrate']
+            )]
+            if not options['skip_static']:
+                futures.append(executor.submit(
+                    self._step, 'collectstatic', startup.collect_static
+                ))
+            for future in futures:
+                future.result()
+
+        self.timings.append(('total', time.perf_counter() - start, ''))
+        for name, seconds, status in self.timings:
+            self.stdout.write(
+                f'{name:<14}{seconds:>7.2f}s  {status}'.rstrip(),
+                self.style.SUCCESS,
+            )
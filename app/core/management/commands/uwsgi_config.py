@@ -0,0 +1,60 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from core import server_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Write a uwsgi ini file sized from the CPU quota and memory limit '
+        'of the container.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Path of the ini file, - prints it.',
+        )
+        parser.add_argument('--socket', default=':9000')
+        parser.add_argument(
+            '--http-socket',
+            help='Serve plain HTTP on this address instead of --socket.',
+        )
+        parser.add_argument('--workers', type=int)
+        parser.add_argument('--threads', type=int)
+
+    def handle(self, *args, **options):
+        cpus = server_config.cpu_limit()
+        memory = server_config.memory_limit()
+
+        env = dict(os.environ)
+        for name in ('workers', 'threads'):
+            if options[name]:
+                env[f'UWSGI_{name.upper()}'] = str(options[name])
+
+        if options['http_socket']:
+            sockets = {'http-socket': options['http_socket']}
+        else:
+            sockets = {'socket': options['socket']}
+        uwsgi_options = {
+            **sockets, **server_config.uwsgi_options(cpus, memory, env)
+        }
+
+        memory_mb = 'unknown' if memory is None else memory // server_config.MB
+        ini = server_config.render_ini(
+            uwsgi_options,
+            comment=f'Generated for {cpus:g} CPU(s) and {memory_mb}MB',
+        )
+        if options['output'] == '-':
+            self.stdout.write(ini, ending='')
+            return
+
+        with open(options['output'], 'w') as output:
+            output.write(ini)
+        self.stdout.write(self.style.SUCCESS(
+            f'uwsgi: {uwsgi_options["workers"]} worker(s) x '
+            f'{uwsgi_options["threads"]} thread(s) for {cpus:g} CPU(s) and '
+            f'{memory_mb}MB, written to {options["output"]}'
+        ))
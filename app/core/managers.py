@@ -1,4 +1,11 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.models import BaseUserManager
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -23,4 +30,54 @@ class UserManager(BaseUserManager):
 
         user.save(using=self._db)
 
-        return user 
\ No newline at end of file
+        return user 
+
+
+class RecipeAttrManager(models.Manager):
+    def lock(self, ids):
+        # Taken before the recipe links of ids change. Concurrent link
+        # changes of the same tag or ingredient then commit one after
+        # the other, so each recount sees the links of the one before
+        # rather than its own stale snapshot of them
+        list(
+            self.filter(id__in=ids).order_by('id').select_for_update()
+            .values_list('id', flat=True)
+        )
+
+    def refresh_recipe_counts(self, ids):
+        # Recomputes the denormalized recipe_count from the m2m through
+        # table, the rows must have been locked with lock() beforehand
+        if not ids:
+            return
+
+        link_model = self.model.recipe_set.through
+        link_field = f'{self.model._meta.model_name}_id'
+
+        counts = link_model.objects.filter(
+            **{link_field: OuterRef('pk')}
+        ).order_by().values(link_field).annotate(
+            total=Count('id')
+        ).values('total')
+
+        self.filter(id__in=ids).update(
+            recipe_count=Coalesce(Subquery(counts), 0)
+        )
+
+
+class TombstoneManager(models.Manager):
+    def record(self, user_id, kind, ids, batch_size=None):
+        # Sync tokens older than SYNC_TOMBSTONE_RETENTION_DAYS are
+        # answered 410, so the user's older tombstones are dropped as
+        # new ones are written, through the (user, deleted_at) index
+        cutoff = timezone.now() - timedelta(
+            days=settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        )
+        self.filter(user_id=user_id, deleted_at__lt=cutoff).delete()
+
+        return self.bulk_create(
+            [
+                self.model(user_id=user_id, kind=kind, object_id=pk)
+                for pk in ids
+            ],
+            batch_size=batch_size,
+        )
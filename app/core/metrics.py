@@ -0,0 +1,148 @@
+"""
+Prometheus metrics for the API.
+
+With PROMETHEUS_MULTIPROC_DIR set, as scripts/run.sh does, each worker
+writes its samples to mmap files in that directory and /metrics sums
+them, so a scrape covers every worker whichever one serves it.
+"""
+import contextvars
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by route.',
+    ['method', 'route'],
+)
+RESPONSES = Counter(
+    'http_responses',
+    'Responses by route and status code.',
+    ['method', 'route', 'status'],
+)
+DB_QUERY_SECONDS = Histogram(
+    'db_query_duration_seconds',
+    'Database query latency.',
+    ['alias'],
+    buckets=(
+        .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5,
+    ),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'db_queries_per_request',
+    'Database queries made by a request.',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests',
+    'Cache lookups by cache and result (hit or miss).',
+    ['cache', 'result'],
+)
+REQUESTS_SHED = Counter(
+    'http_requests_shed',
+    'Requests answered 503 by load shedding, by reason.',
+    ['reason'],
+)
+IMAGE_SECONDS = Histogram(
+    'image_processing_seconds',
+    'Recipe image upload time by stage (validate or save).',
+    ['stage'],
+)
+
+# [query count] of the request being served, shared with pool threads
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def observe_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_SECONDS.labels(context['connection'].alias).observe(
+            time.perf_counter() - start
+        )
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+
+
+def install_query_observer(sender, connection, **kwargs):
+    # connection_created fires on every reconnect of the same wrapper
+    if observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, observe_query)
+
+
+def cache_lookup(cache, hit):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class PrometheusMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+
+        return self.observe(request, response, start, queries[0])
+
+    async def __acall__(self, request):
+        queries = [0]
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+
+        return self.observe(request, response, start, queries[0])
+
+    def observe(self, request, response, start, queries):
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        REQUEST_SECONDS.labels(request.method, route).observe(
+            time.perf_counter() - start
+        )
+        RESPONSES.labels(request.method, route, response.status_code).inc()
+        DB_QUERIES_PER_REQUEST.labels(route).observe(queries)
+
+        return response
+
+
+def metrics_view(request):
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+
+    return HttpResponse(
+        generate_latest(registry), content_type=CONTENT_TYPE_LATEST
+    )
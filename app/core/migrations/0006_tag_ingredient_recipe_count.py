@@ -0,0 +1,35 @@
+# Generated by Django 4.0.10 on 2026-10-18 22:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=[
+                'UPDATE core_tag SET recipe_count = ('
+                'SELECT COUNT(*) FROM core_recipe_tags '
+                'WHERE core_recipe_tags.tag_id = core_tag.id)',
+                'UPDATE core_ingredient SET recipe_count = ('
+                'SELECT COUNT(*) FROM core_recipe_ingredients '
+                'WHERE core_recipe_ingredients.ingredient_id = '
+                'core_ingredient.id)',
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -2,10 +2,11 @@ import uuid
 import os
 
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models 
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 
-from .managers import UserManager
+from .managers import UserManager, RecipeAttrManager, TombstoneManager
 
 def recipe_image_file_path(instance, filename):
     # Generate file path for new recipe image
@@ -27,6 +28,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Set when the account was disabled to have its data purged
+    deletion_requested_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
     
@@ -48,6 +51,12 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image  = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
 
 
     def __str__(self):
@@ -62,6 +71,15 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,    
     )
+    recipe_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -72,6 +90,64 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    recipe_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Tombstone(models.Model):
+    # Records deleted recipes, tags and ingredients for delta sync clients
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+    )
+    kind = models.CharField(max_length=32)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class IdempotencyKey(models.Model):
+    # Response of the first request sent with a client's Idempotency-Key
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'], name='unique_idempotency_key',
+            ),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.key
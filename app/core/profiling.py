@@ -0,0 +1,153 @@
+"""
+On-demand profiles of single API requests, for staff users.
+
+A request with ?_profile=1 or an X-Profile: 1 header from a staff user
+runs under cProfile while a sampling thread records its stacks. Both are
+written to PROFILER_DIR: a .prof file for pstats/snakeviz and a
+.collapsed file for flamegraph.pl or speedscope. Profiles are limited
+to PROFILER_RATE_LIMIT per user per minute and the oldest files are
+removed once the directory grows past PROFILER_MAX_BYTES.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import APIException
+
+
+def profile_requested(request):
+    return (
+        request.GET.get('_profile') == '1'
+        or request.META.get('HTTP_X_PROFILE') == '1'
+    )
+
+
+def allow_profile(user_id):
+    limit = settings.PROFILER_RATE_LIMIT
+    key = f'profiler:rate:{user_id}'
+    if cache.add(key, 1, 60):
+        return limit >= 1
+
+    try:
+        return cache.incr(key) <= limit
+    except ValueError:
+        # The window expired between add and incr
+        return cache.add(key, 1, 60) and limit >= 1
+
+
+def prune(directory, max_bytes):
+    # Removes the oldest profiles until the directory fits in max_bytes
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def _frame_name(code):
+    filename = os.path.basename(code.co_filename)
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler(threading.Thread):
+    """Collect the stacks of another thread into collapsed stack counts."""
+
+    def __init__(self, thread_id, interval, max_samples):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_samples = max_samples
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        samples = 0
+        while samples < self.max_samples and not self._stopped.wait(
+            self.interval
+        ):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+                samples += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def collapsed(self):
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class RequestProfiler:
+    def __init__(self, name):
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        self.name = f'{stamp}-{name}-{uuid.uuid4().hex[:8]}'
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(
+            threading.get_ident(),
+            settings.PROFILER_SAMPLE_INTERVAL,
+            settings.PROFILER_MAX_SAMPLES,
+        )
+
+    def __enter__(self):
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profile.disable()
+        self._sampler.stop()
+        self.save(settings.PROFILER_DIR)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.name)
+        self._profile.dump_stats(f'{path}.prof')
+        with open(f'{path}.collapsed', 'w') as collapsed:
+            collapsed.write(self._sampler.collapsed())
+
+        prune(directory, settings.PROFILER_MAX_BYTES)
+
+
+class ProfilingMixin:
+    """Profile a DRF view when a staff user asks for it."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if not profile_requested(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        # Authenticates early, only for requests asking for a profile
+        try:
+            user = self.initialize_request(request, *args, **kwargs).user
+        except APIException:
+            user = None
+        if not (user and user.is_staff and allow_profile(user.pk)):
+            return super().dispatch(request, *args, **kwargs)
+
+        with RequestProfiler(type(self).__name__) as profiler:
+            response = super().dispatch(request, *args, **kwargs)
+            # Rendering would otherwise happen after the profile stops
+            if hasattr(response, 'render'):
+                response.render()
+
+        response['X-Profile'] = profiler.name
+        return response
@@ -0,0 +1,81 @@
+"""
+Per-view query budgets.
+
+Views using QueryBudgetMixin declare how many queries each action may
+run, e.g. `query_budgets = {'list': 4}` for RecipeViewSet.list. Going
+over budget raises QueryBudgetExceeded when QUERY_BUDGET_RAISE is set,
+as it is in tests and DEBUG. Otherwise a sample of requests is logged
+with their query count, as a warning when over budget, and
+`manage.py query_budgets` compares the counts with the budgets.
+"""
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core.timing import view_name
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper()
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def check_budget(name, budget, queries):
+    over = budget is not None and queries > budget
+    if over and settings.QUERY_BUDGET_RAISE:
+        raise QueryBudgetExceeded(
+            f'{name} ran {queries} queries, its budget is {budget}'
+        )
+
+    if random.random() >= settings.QUERY_BUDGET_SAMPLE_RATE:
+        return
+
+    entry = json.dumps({'view': name, 'queries': queries, 'budget': budget})
+    if over:
+        logger.warning(entry)
+    else:
+        logger.info(entry)
+
+
+class QueryBudgetMixin:
+    """Check the queries run by a DRF view against its budget."""
+
+    # action (or method for plain API views) -> maximum number of queries
+    query_budgets = {}
+
+    def get_query_budget(self, request):
+        key = getattr(self, 'action', None) or request.method.lower()
+        return self.query_budgets.get(key)
+
+    def dispatch(self, request, *args, **kwargs):
+        counter = QueryCounter()
+        # Connections are per thread, install where the view runs
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(counter)
+                )
+            response = super().dispatch(request, *args, **kwargs)
+
+        check_budget(
+            view_name(self, request),
+            self.get_query_budget(request),
+            counter.queries,
+        )
+        return response
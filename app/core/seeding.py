@@ -0,0 +1,286 @@
+"""
+Bulk generation of users, recipes, tags, ingredients and their links.
+
+Rows are streamed to PostgreSQL with COPY. Primary keys are reserved up
+front in one block per table, so links can reference rows that are
+still being written and the denormalized recipe counts are known before
+the tags and ingredients are copied. Every value is drawn from one
+seeded generator, so the same options produce the same data.
+
+Maintaining the secondary indexes row by row and checking every link's
+foreign keys at commit cost more than the COPY itself. The seeded
+tables' secondary indexes, unique and foreign key constraints are
+therefore dropped for the load and rebuilt in bulk before the
+transaction commits, which locks the tables for its whole length. When
+seeding into tables that already hold far more rows than are added,
+rebuilding costs more than it saves; keep_indexes skips it.
+"""
+import io
+import itertools
+import math
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+
+
+COPY_ROWS = 50000
+
+DISTRIBUTIONS = ['uniform', 'loguniform', 'pareto']
+
+
+def count_sampler(distribution, low, high, shape=1.2):
+    # Returns rng -> int between low and high
+    if distribution == 'uniform':
+        return lambda rng: rng.randrange(low, high + 1)
+    if distribution == 'loguniform':
+        log_low, log_high = math.log(max(low, 1)), math.log(max(high, 1))
+        return lambda rng: min(high, max(low, int(round(
+            math.exp(rng.uniform(log_low, log_high))
+        ))))
+    if distribution == 'pareto':
+        # Most draws are near low, a few reach high
+        return lambda rng: min(high, int(
+            max(low, 1) * rng.paretovariate(shape)
+        ))
+    raise ValueError(f'Unknown distribution {distribution!r}')
+
+
+def zipf_cum_weights(count, exponent):
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(count)
+    ))
+
+
+def _escape(value):
+    if value is None:
+        return '\\N'
+    value = str(value)
+    if '\\' in value or '\t' in value or '\n' in value:
+        value = value.replace('\\', '\\\\').replace(
+            '\t', '\\t'
+        ).replace('\n', '\\n')
+    return value
+
+
+class CopyWriter:
+    """Buffer rows for one table and send them with COPY FROM STDIN."""
+
+    def __init__(self, cursor, table, columns):
+        self.cursor = cursor
+        self.sql = (
+            f'COPY {connection.ops.quote_name(table)} '
+            f'({", ".join(connection.ops.quote_name(c) for c in columns)}) '
+            'FROM STDIN'
+        )
+        self.buffer = []
+        self.rows = 0
+
+    def write(self, *values):
+        self.buffer.append('\t'.join(map(_escape, values)))
+        if len(self.buffer) >= COPY_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        self.cursor.copy_expert(
+            self.sql, io.StringIO('\n'.join(self.buffer) + '\n')
+        )
+        self.rows += len(self.buffer)
+        self.buffer = []
+
+
+def _writer(cursor, model, names):
+    return CopyWriter(cursor, model._meta.db_table, [
+        model._meta.get_field(name).column for name in names
+    ])
+
+
+def reserve_ids(cursor, model, count):
+    # Takes a block of count IDs from the table's sequence
+    if not count:
+        return 0
+    cursor.execute(
+        'SELECT setval(seq, nextval(seq) + %s - 1) FROM '
+        "(SELECT pg_get_serial_sequence(%s, 'id')::regclass AS seq) s",
+        [count, model._meta.db_table],
+    )
+    return cursor.fetchone()[0] - count + 1
+
+
+def _constraints_and_indexes(cursor, tables):
+    # Unique and foreign key constraints, in the order they are added
+    # back, and the indexes that back no constraint
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname, "
+        "pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = ANY(%s::regclass[]) AND contype IN ('u', 'f') "
+        "ORDER BY contype DESC, conname",
+        [tables],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) "
+        "FROM pg_index i WHERE indrelid = ANY(%s::regclass[]) "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c "
+        "WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid) "
+        "ORDER BY 1",
+        [tables],
+    )
+    return constraints, cursor.fetchall()
+
+
+@contextmanager
+def without_indexes(cursor, tables):
+    """
+    Drop the secondary indexes, unique and foreign key constraints of
+    tables, restoring them when the block exits. Must run inside a
+    transaction so that a failed load leaves them in place.
+    """
+    quote = connection.ops.quote_name
+    constraints, indexes = _constraints_and_indexes(cursor, tables)
+    # Foreign key checks still deferred from earlier writes of the
+    # transaction, such as deleting the previous dataset, block ALTER TABLE
+    connection.check_constraints()
+    for table, name, _ in constraints:
+        cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {quote(name)}')
+    for name, _ in indexes:
+        cursor.execute(f'DROP INDEX {name}')
+
+    yield
+
+    for _, definition in indexes:
+        cursor.execute(definition)
+    # Unique constraints build their index, foreign keys are then
+    # checked with one join per constraint instead of once per row
+    for table, name, definition in constraints:
+        cursor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {quote(name)} {definition}'
+        )
+
+
+def generate(users, recipes_per_user, tags, ingredients,
+             tags_per_recipe=(1, 4), ingredients_per_recipe=(3, 10),
+             distribution='loguniform', shape=1.2, zipf=1.1, seed=0,
+             email_domain='seed.example.com', password_hash='!',
+             keep_indexes=False):
+    """
+    Write users with recipes_per_user (low, high) recipes each, drawn
+    from distribution. Each user gets its own tags and ingredients,
+    linked to recipes with Zipf popularity. Returns the rows written per
+    table and the seconds it took, index rebuilds and commit included.
+    """
+    rng = random.Random(seed)
+    recipe_count = count_sampler(distribution, *recipes_per_user, shape)
+    tag_count = count_sampler('uniform', *tags_per_recipe)
+    ingredient_count = count_sampler('uniform', *ingredients_per_recipe)
+    tag_weights = zipf_cum_weights(tags, zipf)
+    ingredient_weights = zipf_cum_weights(ingredients, zipf)
+    tag_ranks = range(tags)
+    ingredient_ranks = range(ingredients)
+
+    counts = [recipe_count(rng) for _ in range(users)]
+    now = timezone.now().isoformat()
+    User = get_user_model()
+    TagLink = Recipe.tags.through
+    IngredientLink = Recipe.ingredients.through
+
+    models = [User, Recipe, Tag, Ingredient, TagLink, IngredientLink]
+    start = time.perf_counter()
+    with transaction.atomic(), connection.cursor() as cursor, \
+            ExitStack() as stack:
+        # Keeps other writers from taking IDs inside the reserved blocks
+        for model in [User, Recipe, Tag, Ingredient]:
+            table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(f'LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE')
+        first_user = reserve_ids(cursor, User, users)
+        first_recipe = reserve_ids(cursor, Recipe, sum(counts))
+        first_tag = reserve_ids(cursor, Tag, users * tags)
+        first_ingredient = reserve_ids(cursor, Ingredient, users * ingredients)
+
+        writers = {
+            'users': _writer(cursor, User, [
+                'id', 'password', 'is_superuser', 'email', 'name',
+                'is_active', 'is_staff',
+            ]),
+            'recipes': _writer(cursor, Recipe, [
+                'id', 'user', 'title', 'description', 'time_minutes',
+                'price', 'link', 'updated_at',
+            ]),
+            'tags': _writer(cursor, Tag, [
+                'id', 'name', 'user', 'recipe_count', 'updated_at',
+            ]),
+            'ingredients': _writer(cursor, Ingredient, [
+                'id', 'name', 'user', 'recipe_count', 'updated_at',
+            ]),
+            'recipe_tags': _writer(cursor, TagLink, ['recipe', 'tag']),
+            'recipe_ingredients': _writer(
+                cursor, IngredientLink, ['recipe', 'ingredient']
+            ),
+        }
+        if not keep_indexes:
+            # Restored when the stack exits, before the commit
+            stack.enter_context(without_indexes(
+                cursor, [model._meta.db_table for model in models]
+            ))
+
+        recipe_id = first_recipe
+        for index, count in enumerate(counts):
+            user_id = first_user + index
+            writers['users'].write(
+                user_id, password_hash, 'f', f'user{user_id}@{email_domain}',
+                f'User {user_id}', 't', 'f',
+            )
+
+            tag_base = first_tag + index * tags
+            ingredient_base = first_ingredient + index * ingredients
+            tag_usage = [0] * tags
+            ingredient_usage = [0] * ingredients
+
+            for _ in range(count):
+                cents = rng.randrange(100, 10000)
+                writers['recipes'].write(
+                    recipe_id, user_id, f'Recipe {rng.randrange(10 ** 6)}',
+                    '', rng.randrange(5, 181),
+                    f'{cents // 100}.{cents % 100:02d}', '', now,
+                )
+                for rank in set(rng.choices(
+                    tag_ranks, cum_weights=tag_weights, k=tag_count(rng)
+                )):
+                    tag_usage[rank] += 1
+                    writers['recipe_tags'].write(recipe_id, tag_base + rank)
+                for rank in set(rng.choices(
+                    ingredient_ranks,
+                    cum_weights=ingredient_weights,
+                    k=ingredient_count(rng),
+                )):
+                    ingredient_usage[rank] += 1
+                    writers['recipe_ingredients'].write(
+                        recipe_id, ingredient_base + rank
+                    )
+                recipe_id += 1
+
+            for rank, used in enumerate(tag_usage):
+                writers['tags'].write(
+                    tag_base + rank, f'tag-{rank}', user_id, used, now
+                )
+            for rank, used in enumerate(ingredient_usage):
+                writers['ingredients'].write(
+                    ingredient_base + rank, f'ingredient-{rank}', user_id,
+                    used, now,
+                )
+
+        # Foreign keys are dropped or deferred to the commit, so the
+        # order of the tables does not matter
+        for writer in writers.values():
+            writer.flush()
+
+    seconds = time.perf_counter() - start
+    rows = {name: writer.rows for name, writer in writers.items()}
+    return rows, seconds
@@ -0,0 +1,116 @@
+"""
+uwsgi settings derived from the container's CPU quota and memory limit.
+
+Workers are sized from the CPU quota and capped so that every worker can
+grow to UWSGI_WORKER_MEMORY_MB within the memory limit. A worker whose
+RSS passes that budget, or that has served UWSGI_MAX_REQUESTS requests,
+is replaced. The cheaper subsystem idles workers down to a quarter of
+the maximum and spawns them back as requests queue up.
+"""
+import math
+import os
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+MB = 1024 * 1024
+
+# cgroup v1 reports "no limit" as a page-rounded LONG_MAX
+UNLIMITED = 2 ** 60
+
+
+def _read(path):
+    try:
+        with open(path) as source:
+            return source.read().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit(root=CGROUP_ROOT):
+    """CPUs available to the container, fractional under a CFS quota."""
+    cpu_max = _read(os.path.join(root, 'cpu.max'))
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(' ')
+        if quota != 'max':
+            return int(quota) / int(period or 100000)
+    else:
+        quota = _read(os.path.join(root, 'cpu', 'cpu.cfs_quota_us'))
+        period = _read(os.path.join(root, 'cpu', 'cpu.cfs_period_us'))
+        if quota is not None and period and int(quota) > 0:
+            return int(quota) / int(period)
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_limit(root=CGROUP_ROOT):
+    """Bytes of memory available to the container."""
+    limit = _read(os.path.join(root, 'memory.max'))
+    if limit is None:
+        limit = _read(os.path.join(root, 'memory', 'memory.limit_in_bytes'))
+    if limit and limit != 'max' and int(limit) < UNLIMITED:
+        return int(limit)
+
+    meminfo = _read('/proc/meminfo') or ''
+    for line in meminfo.splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+def _env_int(env, name, default):
+    return int(env.get(name) or default)
+
+
+def uwsgi_options(cpus, memory, env=os.environ):
+    """Options for an ini file, every default can be overridden by env."""
+    worker_mb = _env_int(env, 'UWSGI_WORKER_MEMORY_MB', 192)
+    reserve_mb = _env_int(env, 'UWSGI_RESERVED_MEMORY_MB', 128)
+    threads = _env_int(env, 'UWSGI_THREADS', 2)
+
+    # Views mostly wait on the database, so more workers than CPUs
+    workers = math.ceil(cpus * float(env.get('UWSGI_WORKERS_PER_CPU') or 2))
+    if memory is not None:
+        workers = min(workers, (memory // MB - reserve_mb) // worker_mb)
+    workers = max(1, min(workers, _env_int(env, 'UWSGI_MAX_WORKERS', 32)))
+    workers = _env_int(env, 'UWSGI_WORKERS', workers)
+
+    options = {
+        'module': 'app.wsgi',
+        'master': True,
+        'need-app': True,
+        'enable-threads': True,
+        'workers': workers,
+        'threads': threads,
+        # LOAD_SHED_QUEUE_DEPTH is derived from the same variable
+        'listen': _env_int(env, 'UWSGI_LISTEN', 100),
+        'reload-on-rss': _env_int(
+            env, 'UWSGI_RELOAD_ON_RSS_MB', worker_mb
+        ),
+        'max-requests': _env_int(env, 'UWSGI_MAX_REQUESTS', 5000),
+        # Lets a recycled worker finish its requests first
+        'worker-reload-mercy': 30,
+    }
+
+    if workers > 1:
+        options.update({
+            'cheaper-algo': 'spare',
+            'cheaper': max(1, workers // 4),
+            'cheaper-initial': max(1, workers // 2),
+            'cheaper-step': 1,
+            'cheaper-overload': 5,
+        })
+
+    return options
+
+
+def render_ini(options, comment=''):
+    lines = [f'# {line}' for line in comment.splitlines()]
+    lines.append('[uwsgi]')
+    for name, value in options.items():
+        if value is True:
+            value = 'true'
+        lines.append(f'{name} = {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,154 @@
+"""
+Log of queries slower than SLOW_QUERY_THRESHOLD_MS.
+
+Each entry is a JSON line with the query's normalized SQL, its
+fingerprint and the view that ran it. A sample of slow SELECTs are run
+again under EXPLAIN (ANALYZE, BUFFERS) and logged with their plan, at
+most once per fingerprint every SLOW_QUERY_EXPLAIN_INTERVAL seconds.
+`manage.py slow_queries` summarizes the log.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+
+import psycopg2
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_current_view = contextvars.ContextVar('current_view', default=None)
+
+_last_explained = {}
+_explain_lock = threading.Lock()
+
+NORMALIZE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalize(sql):
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:16]
+
+
+def _should_explain(sql, many, key):
+    if many or not sql.lstrip().upper().startswith('SELECT'):
+        return False
+    if random.random() >= settings.SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        return False
+
+    now = time.monotonic()
+    interval = settings.SLOW_QUERY_EXPLAIN_INTERVAL
+    with _explain_lock:
+        last = _last_explained.get(key)
+        if last is not None and now - last < interval:
+            return False
+        _last_explained[key] = now
+
+    return True
+
+
+def explain(connection, sql, params):
+    # Runs on the raw connection so the EXPLAIN itself is not logged, and
+    # inside a savepoint so a failure cannot abort the caller's transaction
+    in_transaction = not connection.get_autocommit()
+    with connection.connection.cursor() as cursor:
+        if in_transaction:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        except psycopg2.Error:
+            if not in_transaction:
+                return None
+            cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            plan = None
+        if in_transaction:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+
+    return plan
+
+
+def log_slow_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        connection = context['connection']
+        normalized = normalize(sql)
+        key = fingerprint(normalized)
+        entry = {
+            'fingerprint': key,
+            'sql': normalized,
+            'duration_ms': round(duration_ms, 2),
+            'view': _current_view.get(),
+            'alias': connection.alias,
+        }
+        if _should_explain(sql, many, key):
+            entry['plan'] = explain(connection, sql, params)
+
+        logger.warning(json.dumps(entry))
+
+    return result
+
+
+def install_slow_query_log(sender, connection, **kwargs):
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow_query)
+
+
+class SlowQueryMiddleware:
+    """Record which view is running so slow queries can name it."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django awaits a coroutine process_view in the request's
+            # task, a plain one would run in a thread and only reach
+            # the request's context through sync_to_async
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = _current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_view.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_view.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current_view.set(request.resolver_match.view_name)
+
+    async def aprocess_view(self, request, view_func, view_args,
+                            view_kwargs):
+        _current_view.set(request.resolver_match.view_name)
@@ -0,0 +1,90 @@
+"""
+Container startup steps used by `manage.py startup`.
+
+Each step does the cheapest check that tells whether its work is needed:
+a bare connection attempt for the database, a hash of the static source
+files for collectstatic and the migration plan for migrate.
+"""
+import hashlib
+import os
+import time
+
+import psycopg2
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+class StepSkipped(Exception):
+    """Raised by a step when there was nothing to do."""
+
+
+def wait_for_database(timeout, first_delay=0.05, max_delay=2):
+    # Opens and closes one connection, retrying with exponential backoff
+    params = {
+        **connections['default'].get_connection_params(),
+        'connect_timeout': 2,
+    }
+    deadline = time.monotonic() + timeout
+    delay = first_delay
+    attempts = 0
+
+    while True:
+        attempts += 1
+        try:
+            psycopg2.connect(**params).close()
+            return attempts
+        except psycopg2.OperationalError:
+            if time.monotonic() + delay > deadline:
+                raise
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def static_manifest_path():
+    return os.path.join(settings.STATIC_ROOT, '.collectstatic.sha1')
+
+
+def static_fingerprint():
+    digest = hashlib.sha1(settings.STATICFILES_STORAGE.encode())
+    files = []
+    for finder in finders.get_finders():
+        for path, storage in finder.list(IGNORE_PATTERNS):
+            files.append((path, storage))
+
+    for path, storage in sorted(files, key=lambda item: item[0]):
+        digest.update(path.encode())
+        with storage.open(path) as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def collect_static(stdout):
+    fingerprint = static_fingerprint()
+    manifest = static_manifest_path()
+    if os.path.exists(manifest):
+        with open(manifest) as previous:
+            if previous.read().strip() == fingerprint:
+                raise StepSkipped('static files unchanged')
+
+    call_command('collectstatic', interactive=False, stdout=stdout)
+    with open(manifest, 'w') as current:
+        current.write(fingerprint)
+
+
+def migrate(stdout):
+    connection = connections['default']
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if not plan:
+        raise StepSkipped('no unapplied migrations')
+
+    call_command('migrate', interactive=False, stdout=stdout)
@@ -0,0 +1,61 @@
+import inspect
+
+from asgiref.sync import AsyncToSync, SyncToAsync
+from django.core.handlers.asgi import ASGIHandler
+from django.http import JsonResponse
+from django.test import AsyncClient, SimpleTestCase, override_settings
+from django.urls import path
+
+from core.metrics import PrometheusMiddleware
+from core.slow_queries import SlowQueryMiddleware, _current_view
+from core.throttling import LoadSheddingMiddleware
+from core.timing import ServerTimingMiddleware
+
+
+async def current_view(request):
+    return JsonResponse({'view': _current_view.get()})
+
+
+urlpatterns = [
+    path('current-view/', current_view, name='current-view'),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, SERVER_TIMING_SAMPLE_RATE=1)
+class AsgiMiddlewareTests(SimpleTestCase):
+    def test_chain_has_no_thread_hops(self):
+        handler = ASGIHandler()
+
+        layer = handler._middleware_chain
+        middleware = []
+        while layer is not None:
+            # An adapter here would run the rest of the chain in a
+            # thread or block one on the event loop
+            self.assertNotIsInstance(layer, (SyncToAsync, AsyncToSync))
+            self.assertTrue(inspect.iscoroutinefunction(layer), layer)
+            middleware.append(layer.__wrapped__)
+            layer = getattr(layer.__wrapped__, 'get_response', None)
+
+        classes = [type(instance) for instance in middleware]
+        for cls in [
+            PrometheusMiddleware,
+            LoadSheddingMiddleware,
+            ServerTimingMiddleware,
+            SlowQueryMiddleware,
+        ]:
+            self.assertIn(cls, classes)
+
+        process_view = next(
+            method for method in handler._view_middleware
+            if isinstance(getattr(method, '__self__', None),
+                          SlowQueryMiddleware)
+        )
+        self.assertTrue(inspect.iscoroutinefunction(process_view))
+
+    async def test_request_through_async_chain(self):
+        response = await AsyncClient().get('/current-view/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'view': 'current-view'})
+        self.assertTrue(response['Server-Timing'].startswith('total;dur='))
+        self.assertIsNone(_current_view.get())
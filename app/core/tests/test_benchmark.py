@@ -0,0 +1,130 @@
+import json
+import random
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.response import Response
+
+from core import benchmark
+from core.models import Recipe, Tag
+from user.deletion import purge_user
+
+
+class PickTests(SimpleTestCase):
+    def test_popular_items_picked_most(self):
+        rng = random.Random(1)
+        weights = benchmark.zipf_weights(50, 1.1)
+
+        picks = [
+            item
+            for _ in range(2000)
+            for item in benchmark.pick(rng, range(50), weights, 2)
+        ]
+
+        self.assertGreater(picks.count(0), picks.count(10) * 3)
+
+    def test_picks_are_distinct(self):
+        rng = random.Random(1)
+
+        picked = benchmark.pick(rng, range(3), [1, 1, 1], 3)
+
+        self.assertEqual(len(set(picked)), len(picked))
+
+
+class BenchmarkCommandTests(TestCase):
+    def run_benchmark(self, **options):
+        out = StringIO()
+        call_command(
+            'benchmark',
+            requests=20,
+            concurrency=1,
+            warmup=2,
+            stdout=out,
+            stderr=StringIO(),
+            **options
+        )
+        return json.loads(out.getvalue())
+
+    def test_seed_and_run(self):
+        report = self.run_benchmark(
+            seed=True,
+            users=2,
+            min_recipes=5,
+            max_recipes=20,
+            tags=5,
+            ingredients=8,
+        )
+
+        users = benchmark.bench_users()
+        self.assertEqual(users.count(), 2)
+        self.assertEqual(report['dataset']['users'], 2)
+        self.assertEqual(
+            report['dataset']['recipes'],
+            Recipe.objects.filter(user__in=users).count(),
+        )
+        self.assertEqual(report['overall']['requests'], 20)
+        self.assertEqual(report['overall']['errors'], 0)
+        self.assertEqual(
+            set(report['workloads']), {'list', 'detail', 'create', 'upload'}
+        )
+        self.assertGreater(report['overall']['queries']['mean'], 0)
+        self.assertIsNotNone(report['overall']['latency_ms']['p99'])
+
+    def test_reseed_purges_previous_users(self):
+        benchmark.seed_dataset(2, 5, 5, 5, 5, 1.1, seed=7)
+        old_ids = list(benchmark.bench_users().values_list('id', flat=True))
+
+        with patch('core.management.commands.benchmark.purge_user',
+                   wraps=purge_user) as patched_purge:
+            self.run_benchmark(
+                seed=True, users=1, min_recipes=5, max_recipes=5,
+                tags=5, ingredients=5,
+            )
+
+        self.assertEqual(
+            [call.args[0] for call in patched_purge.call_args_list], old_ids
+        )
+        self.assertEqual(benchmark.bench_users().count(), 1)
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    def test_seeded_counts_match_links(self):
+        benchmark.seed_dataset(1, 10, 10, 5, 5, 1.1, seed=7)
+
+        for tag in Tag.objects.filter(user__in=benchmark.bench_users()):
+            self.assertEqual(tag.recipe_count, tag.recipe_set.count())
+
+    def test_run_requires_dataset(self):
+        with self.assertRaisesMessage(CommandError, 'No benchmark users'):
+            self.run_benchmark()
+
+    def test_created_recipes_removed(self):
+        benchmark.seed_dataset(1, 10, 10, 5, 5, 1.1, seed=7)
+
+        self.run_benchmark(mix={'create': 1})
+
+        self.assertEqual(Recipe.objects.count(), 10)
+
+    def test_run_not_throttled(self):
+        benchmark.seed_dataset(1, 10, 10, 5, 5, 1.1, seed=7)
+
+        with override_settings(REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            'DEFAULT_THROTTLE_RATES': {
+                'user': '1/min', 'recipe_create': '1/min',
+            },
+        }):
+            report = self.run_benchmark(mix={'list': 1, 'create': 1})
+
+        self.assertEqual(report['overall']['errors'], 0)
+
+    @patch('core.benchmark.Worker._create',
+           return_value=Response(status=400))
+    def test_failed_create_counts_as_upload_error(self, patched_create):
+        benchmark.seed_dataset(1, 10, 10, 5, 5, 1.1, seed=7)
+
+        report = self.run_benchmark(mix={'upload': 1})
+
+        self.assertEqual(report['workloads']['upload']['errors'], 20)
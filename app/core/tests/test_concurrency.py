@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from core.concurrency import run_blocking, async_view
+
+
+@override_settings(ASYNC_THREAD_POOLS={'test': 2})
+class ConcurrencyTests(SimpleTestCase):
+    def test_run_blocking_is_bounded(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+
+        async def scenario():
+            await asyncio.gather(
+                *[run_blocking('test', work) for _ in range(6)]
+            )
+
+        asyncio.run(scenario())
+
+        self.assertEqual(max(peak), 2)
+
+    def test_async_view_runs_in_pool(self):
+        def view(request):
+            return HttpResponse(threading.current_thread().name)
+
+        wrapped = async_view(view, pool='test')
+        request = RequestFactory().get('/')
+
+        response = asyncio.run(wrapped(request))
+
+        self.assertTrue(asyncio.iscoroutinefunction(wrapped))
+        self.assertTrue(response.content.startswith(b'test-pool'))
@@ -0,0 +1,140 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.db import pool as db_pool
+
+
+DB_POOL_URL = reverse('db-pool')
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        self.pool = db_pool.ConnectionPool(
+            connection.get_connection_params(),
+            max_size=2,
+            timeout=0.2,
+            check_idle=0,
+        )
+        self.addCleanup(self.pool.close)
+
+    def test_connections_reused(self):
+        first = self.pool.getconn()
+        self.pool.putconn(first)
+        second = self.pool.getconn()
+        self.pool.putconn(second)
+
+        self.assertIs(first, second)
+        stats = self.pool.stats()
+        self.assertEqual(stats['connections_created'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_broken_connection_replaced_on_checkout(self):
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+        conn.close()
+
+        replacement = self.pool.getconn()
+        self.pool.putconn(replacement)
+
+        self.assertIsNot(conn, replacement)
+        self.assertEqual(self.pool.stats()['connections_closed'], 1)
+
+    def test_failed_health_check_replaces_connection(self):
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+        other = db_pool.connect(connection.get_connection_params())
+        other.autocommit = True
+        with other.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_terminate_backend(%s)', [conn.get_backend_pid()]
+            )
+        other.close()
+
+        replacement = self.pool.getconn()
+        self.pool.putconn(replacement)
+
+        self.assertIsNot(conn, replacement)
+        self.assertEqual(self.pool.stats()['health_check_failures'], 1)
+
+    def test_expired_connection_replaced(self):
+        self.pool.max_lifetime = 0
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+    def test_open_transaction_rolled_back_on_return(self):
+        conn = self.pool.getconn()
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.pool.putconn(conn)
+
+        self.assertEqual(self.pool.stats()['idle'], 1)
+        self.assertFalse(conn.closed)
+        self.assertEqual(
+            conn.get_transaction_status(),
+            db_pool.psycopg2.extensions.TRANSACTION_STATUS_IDLE,
+        )
+
+    def test_checkout_waits_then_times_out(self):
+        held = [self.pool.getconn(), self.pool.getconn()]
+
+        with self.assertRaises(db_pool.PoolTimeout):
+            self.pool.getconn()
+
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+        # A returned connection is handed to the waiting thread
+        release = threading.Timer(0.05, self.pool.putconn, [held.pop()])
+        release.start()
+        conn = self.pool.getconn()
+        release.join()
+
+        self.pool.putconn(conn)
+        self.pool.putconn(held.pop())
+
+    def test_pool_reset_after_fork(self):
+        conn = self.pool.getconn()
+        self.pool.putconn(conn)
+
+        with patch('os.getpid', return_value=-1):
+            self.assertEqual(self.pool.stats()['size'], 0)
+
+        # The parent's connection is dropped, not closed
+        self.assertFalse(conn.closed)
+        conn.close()
+
+
+class DatabasePoolViewTests(TestCase):
+    def test_staff_only(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        ))
+
+        res = client.get(DB_POOL_URL)
+
+        self.assertEqual(res.status_code, 403)
+
+    @patch('core.views.pool_stats')
+    def test_pool_stats_returned(self, patched_pool_stats):
+        patched_pool_stats.return_value = [{'size': 1}]
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_superuser(
+            email='admin@example.com', password='pass123'
+        ))
+
+        res = client.get(DB_POOL_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data, {'pools': [{'size': 1}]})
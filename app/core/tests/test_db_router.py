@@ -0,0 +1,150 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.db import router
+from core.models import Recipe
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='user@example.com', password='pass123'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """The replica alias mirrors the test database on its own connection."""
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        router.reset_health()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            res = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, 200)
+        return primary, replica
+
+    def recipe_queries(self, queries):
+        return [
+            query for query in queries
+            if 'FROM "core_recipe"' in query['sql']
+        ]
+
+    def test_safe_requests_read_from_replica(self):
+        create_recipe(self.user)
+
+        primary, replica = self.get(RECIPES_URL)
+
+        self.assertTrue(self.recipe_queries(replica))
+        self.assertEqual(self.recipe_queries(primary), [])
+
+    def test_writes_go_to_primary(self):
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('2.00'),
+        }
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(replica.captured_queries, [])
+
+    def test_reads_after_write_stick_to_primary(self):
+        self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('2.00'),
+        })
+
+        primary, replica = self.get(RECIPES_URL)
+
+        self.assertTrue(self.recipe_queries(primary))
+        self.assertEqual(replica.captured_queries, [])
+
+    def test_other_users_keep_reading_from_replica(self):
+        self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('2.00'),
+        })
+        self.client.force_authenticate(create_user(email='other@example.com'))
+
+        primary, replica = self.get(RECIPES_URL)
+
+        self.assertTrue(self.recipe_queries(replica))
+
+    @override_settings(DATABASE_REPLICA_STICKY_SECONDS=0)
+    def test_stickiness_expires(self):
+        router.mark_recent_write(self.user.id)
+
+        primary, replica = self.get(RECIPES_URL)
+
+        self.assertTrue(self.recipe_queries(replica))
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        with patch.object(
+            router, '_replica_lag', side_effect=OperationalError
+        ) as patched_lag:
+            primary, replica = self.get(RECIPES_URL)
+            self.get(RECIPES_URL)
+
+        self.assertTrue(self.recipe_queries(primary))
+        self.assertEqual(replica.captured_queries, [])
+        # Not checked again until DATABASE_REPLICA_CHECK_INTERVAL passes
+        self.assertEqual(patched_lag.call_count, 1)
+
+    @override_settings(DATABASE_REPLICA_MAX_LAG=5)
+    def test_lagging_replica_skipped(self):
+        with patch.object(router, '_replica_lag', return_value=30):
+            primary, replica = self.get(RECIPES_URL)
+
+        self.assertTrue(self.recipe_queries(primary))
+
+    def test_replica_error_resets_read_alias(self):
+        with patch.object(
+            RecipeViewSet, 'list', side_effect=OperationalError
+        ), self.assertRaises(OperationalError):
+            self.client.get(RECIPES_URL)
+
+        self.assertIsNone(router._read_alias.get())
+        self.assertFalse(router.replica_is_healthy('replica'))
+        with CaptureQueriesContext(connections['replica']) as replica:
+            list(Recipe.objects.all())
+
+        self.assertEqual(replica.captured_queries, [])
+
+    def test_reads_outside_views_use_primary(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            list(Recipe.objects.all())
+
+        self.assertEqual(replica.captured_queries, [])
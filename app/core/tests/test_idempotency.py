@@ -0,0 +1,194 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import m2m_changed
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Recipe, Tag
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PAYLOAD = {'title': 'Soup', 'time_minutes': 10, 'price': '5.00'}
+
+
+def create_client(email):
+    client = APIClient()
+    client.force_authenticate(get_user_model().objects.create_user(
+        email=email, password='pass123'
+    ))
+    return client
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.client = create_client('user@example.com')
+
+    def _create(self, client=None, key='key-1', **payload):
+        return (client or self.client).post(
+            RECIPES_URL, {**PAYLOAD, **payload}, HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_response(self):
+        first = self._create()
+        retry = self._create()
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_key_reused_for_different_request(self):
+        self._create()
+
+        response = self._create(title='Stew')
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_keys_belong_to_users(self):
+        self._create()
+        self._create(create_client('other@example.com'))
+
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_expired_key_runs_again(self):
+        self._create()
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        response = self._create()
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_failed_request_not_stored(self):
+        response = self._create(time_minutes='')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_without_key(self):
+        self.client.post(RECIPES_URL, PAYLOAD)
+        self.client.post(RECIPES_URL, PAYLOAD)
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+# These wait on each other's locks, which the slow query log would report
+@override_settings(SLOW_QUERY_THRESHOLD_MS=60000)
+class ConcurrentIdempotencyKeyTests(TransactionTestCase):
+    def test_concurrent_duplicate_waits_and_replays(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        created = threading.Event()
+        release = threading.Event()
+        perform_create = RecipeViewSet.perform_create
+
+        def slow_perform_create(view, serializer):
+            perform_create(view, serializer)
+            if not created.is_set():
+                created.set()
+                release.wait(5)
+
+        responses = []
+
+        def post():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                responses.append(client.post(
+                    RECIPES_URL, PAYLOAD, HTTP_IDEMPOTENCY_KEY='key-1'
+                ))
+            finally:
+                connections.close_all()
+
+        with patch.object(
+            RecipeViewSet, 'perform_create', slow_perform_create
+        ):
+            first = threading.Thread(target=post)
+            first.start()
+            created.wait(5)
+            # Blocks on the first request's uncommitted key
+            second = threading.Thread(target=post)
+            second.start()
+            second.join(0.2)
+            self.assertTrue(second.is_alive())
+            release.set()
+            first.join()
+            second.join()
+
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(responses[0].data, responses[1].data)
+        self.assertEqual(
+            [response.has_header('Idempotent-Replayed')
+             for response in responses],
+            [False, True],
+        )
+
+    def test_tags_in_different_order_do_not_deadlock(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        for name in ('Vegan', 'Quick'):
+            Tag.objects.create(user=user, name=name)
+        linked = threading.Barrier(2, timeout=1)
+
+        def wait_for_other(action, **kwargs):
+            # Lines the requests up after a link change, where linking
+            # tag by tag would leave each holding a tag the other needs
+            if action == 'post_add':
+                try:
+                    linked.wait()
+                except threading.BrokenBarrierError:
+                    pass
+
+        m2m_changed.connect(wait_for_other, sender=Recipe.tags.through)
+        self.addCleanup(
+            m2m_changed.disconnect, wait_for_other,
+            sender=Recipe.tags.through,
+        )
+        responses = []
+
+        def post(key, names):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                responses.append(client.post(
+                    RECIPES_URL,
+                    {**PAYLOAD, 'tags': [{'name': name} for name in names]},
+                    format='json',
+                    HTTP_IDEMPOTENCY_KEY=key,
+                ))
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=post, args=('key-1', ['Vegan', 'Quick'])),
+            threading.Thread(target=post, args=('key-2', ['Quick', 'Vegan'])),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [status.HTTP_201_CREATED] * 2,
+        )
+        for tag in Tag.objects.all():
+            self.assertEqual(tag.recipe_count, 2)
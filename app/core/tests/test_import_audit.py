@@ -0,0 +1,36 @@
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from core.management.commands.import_audit import parse_importtime
+
+
+IMPORTTIME = '''\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     re._parser
+import time:       200 |        300 |   re
+import time:        50 |         50 |   json.scanner
+import time:       400 |        750 | json
+import time:        10 |         10 | app
+'''
+
+
+class ParseImportTimeTests(SimpleTestCase):
+    def test_tree_built_from_indentation(self):
+        json_node, app_node = parse_importtime(IMPORTTIME)
+
+        self.assertEqual(json_node.name, 'json')
+        self.assertEqual(json_node.cumulative_us, 750)
+        self.assertEqual(
+            [child.name for child in json_node.children],
+            ['re', 'json.scanner'],
+        )
+        self.assertEqual(json_node.children[0].children[0].name, 're._parser')
+        self.assertEqual(app_node.children, [])
+
+
+class LazySchemaViewTests(TestCase):
+    def test_schema_served(self):
+        res = self.client.get(reverse('api-schema'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'/api/recipe/recipes/', res.content)
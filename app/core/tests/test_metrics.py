@@ -0,0 +1,120 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.similarity import index_cache
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.00'),
+        )
+
+    def test_request_metrics_recorded(self):
+        labels = {'method': 'GET', 'route': 'recipe:recipe-list'}
+        responses = sample('http_responses_total', status='200', **labels)
+        requests = sample('http_request_duration_seconds_count', **labels)
+        query_sum = sample(
+            'db_queries_per_request_sum', route='recipe:recipe-list'
+        )
+
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            sample('http_responses_total', status='200', **labels),
+            responses + 1,
+        )
+        self.assertEqual(
+            sample('http_request_duration_seconds_count', **labels),
+            requests + 1,
+        )
+        self.assertEqual(
+            sample('db_queries_per_request_sum', route='recipe:recipe-list'),
+            query_sum + 3,
+        )
+
+    def test_similarity_index_cache_hits(self):
+        misses = sample(
+            'cache_requests_total', cache='similarity_index', result='miss'
+        )
+        hits = sample(
+            'cache_requests_total', cache='similarity_index', result='hit'
+        )
+
+        index_cache.clear()
+        self.addCleanup(index_cache.clear)
+
+        self.client.get(similar_url(self.recipe.id))
+        self.client.get(similar_url(self.recipe.id))
+
+        self.assertEqual(sample(
+            'cache_requests_total', cache='similarity_index', result='miss'
+        ), misses + 1)
+        self.assertEqual(sample(
+            'cache_requests_total', cache='similarity_index', result='hit'
+        ), hits + 1)
+
+    def test_metrics_exposition(self):
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_request_duration_seconds_bucket', res.content)
+        self.assertIn(b'db_query_duration_seconds_bucket', res.content)
+
+    def test_metrics_aggregated_from_multiprocess_dir(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # As written by another worker's mmap store
+            store = MmapedDict(os.path.join(directory, 'counter_999.db'))
+            store.write_value(mmap_key(
+                'http_responses',
+                'http_responses_total',
+                ['method', 'route', 'status'],
+                ['GET', 'worker', '200'],
+                'Responses by route and status code.',
+            ), 5.0)
+            store.close()
+
+            with patch.dict(
+                os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}
+            ):
+                res = self.client.get(METRICS_URL)
+
+        self.assertIn(
+            b'http_responses_total{method="GET",route="worker",status="200"}'
+            b' 5.0',
+            res.content
+        )
@@ -0,0 +1,82 @@
+import os
+import pstats
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.profiling import prune
+
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(
+            PROFILER_DIR=self.directory, PROFILER_RATE_LIMIT=2
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = get_user_model().objects.create_user(
+            email='staff@example.com', password='pass123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_staff_request_profiled(self):
+        res = self.client.get(TAGS_URL, {'_profile': '1'})
+
+        self.assertEqual(res.status_code, 200)
+        path = os.path.join(self.directory, res['X-Profile'])
+        stats = pstats.Stats(f'{path}.prof')
+        self.assertTrue(any(
+            name == 'dispatch' for _, _, name in stats.stats
+        ))
+        self.assertTrue(os.path.exists(f'{path}.collapsed'))
+
+    def test_profile_header(self):
+        res = self.client.get(TAGS_URL, HTTP_X_PROFILE='1')
+
+        self.assertIn('X-Profile', res)
+
+    def test_non_staff_not_profiled(self):
+        self.user.is_staff = False
+        self.user.save()
+
+        res = self.client.get(TAGS_URL, {'_profile': '1'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile', res)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_profiles_rate_limited(self):
+        responses = [
+            self.client.get(TAGS_URL, {'_profile': '1'}) for _ in range(3)
+        ]
+
+        self.assertEqual(
+            ['X-Profile' in res for res in responses], [True, True, False]
+        )
+
+
+class PruneTests(SimpleTestCase):
+    def test_oldest_files_removed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for index, name in enumerate(['old', 'mid', 'new']):
+                path = os.path.join(directory, name)
+                with open(path, 'w') as profile:
+                    profile.write('x' * 100)
+                os.utime(path, (index, index))
+
+            prune(directory, 250)
+
+            self.assertEqual(sorted(os.listdir(directory)), ['mid', 'new'])
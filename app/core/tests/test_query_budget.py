@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.query_budget import QueryBudgetExceeded
+from recipe.views import RecipeViewSet
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        for index in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {index}',
+                time_minutes=10,
+                price=Decimal('2.00'),
+            )
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'Tag {index}')
+            )
+
+    def test_recipe_list_within_budget(self):
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data), 5)
+
+    def test_over_budget_raises(self):
+        with patch.object(RecipeViewSet, 'query_budgets', {'list': 1}):
+            with self.assertRaisesMessage(
+                QueryBudgetExceeded,
+                'RecipeViewSet.list ran 3 queries, its budget is 1'
+            ):
+                self.client.get(RECIPES_URL)
+
+    @override_settings(QUERY_BUDGET_RAISE=False, QUERY_BUDGET_SAMPLE_RATE=1)
+    def test_over_budget_logged_in_production(self):
+        with patch.object(RecipeViewSet, 'query_budgets', {'list': 1}):
+            with self.assertLogs('core.query_budget', 'WARNING') as logs:
+                res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            json.loads(logs.records[0].getMessage()),
+            {'view': 'RecipeViewSet.list', 'queries': 3, 'budget': 1},
+        )
+
+    @override_settings(QUERY_BUDGET_RAISE=False, QUERY_BUDGET_SAMPLE_RATE=0)
+    def test_unsampled_requests_not_logged(self):
+        with patch.object(RecipeViewSet, 'query_budgets', {'list': 1}):
+            with self.assertNoLogs('core.query_budget'):
+                self.client.get(RECIPES_URL)
+
+
+class QueryBudgetsCommandTests(SimpleTestCase):
+    def test_endpoints_compared_with_budgets(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'query_budgets.log')
+            with open(path, 'w') as log:
+                for view, queries in [
+                    ('RecipeViewSet.list', 3),
+                    ('RecipeViewSet.list', 6),
+                    ('TagViewSets.list', 1),
+                ]:
+                    log.write(json.dumps({
+                        'view': view, 'queries': queries, 'budget': None
+                    }) + '\n')
+            out = StringIO()
+            over = StringIO()
+
+            call_command('query_budgets', file=path, stdout=out)
+            call_command('query_budgets', file=path, over=True, stdout=over)
+
+        lines = {
+            line.split('  ')[0]: line for line in out.getvalue().splitlines()
+        }
+        self.assertEqual(
+            lines['RecipeViewSet.list'],
+            'RecipeViewSet.list  budget=4  max=6  mean=4.5  samples=2'
+        )
+        self.assertEqual(
+            lines['TagViewSets.list'],
+            'TagViewSets.list  budget=2  max=1  mean=1.0  samples=1'
+        )
+        self.assertEqual(
+            lines['RecipeViewSet.create'],
+            'RecipeViewSet.create  budget=-  samples=0'
+        )
+        self.assertIn('SyncView.get', lines)
+        self.assertEqual(
+            over.getvalue().splitlines(),
+            ['RecipeViewSet.list  budget=4  max=6  mean=4.5  samples=2'],
+        )
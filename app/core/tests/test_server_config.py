@@ -0,0 +1,114 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core import server_config
+
+
+GB = 1024 * server_config.MB
+
+
+class LimitTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+    def _write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as limit:
+            limit.write(content)
+
+    def test_cgroup_v2_limits(self):
+        self._write('cpu.max', '150000 100000\n')
+        self._write('memory.max', f'{GB}\n')
+
+        self.assertEqual(server_config.cpu_limit(self.root), 1.5)
+        self.assertEqual(server_config.memory_limit(self.root), GB)
+
+    def test_cgroup_v1_limits(self):
+        self._write('cpu/cpu.cfs_quota_us', '200000\n')
+        self._write('cpu/cpu.cfs_period_us', '100000\n')
+        self._write('memory/memory.limit_in_bytes', f'{2 * GB}\n')
+
+        self.assertEqual(server_config.cpu_limit(self.root), 2)
+        self.assertEqual(server_config.memory_limit(self.root), 2 * GB)
+
+    def test_unlimited_falls_back_to_host(self):
+        self._write('cpu.max', 'max 100000\n')
+        self._write('memory.max', 'max\n')
+
+        self.assertGreaterEqual(server_config.cpu_limit(self.root), 1)
+        self.assertGreater(server_config.memory_limit(self.root), 0)
+
+
+class UwsgiOptionsTests(SimpleTestCase):
+    def test_workers_follow_cpu_quota(self):
+        options = server_config.uwsgi_options(2, 8 * GB, env={})
+
+        self.assertEqual(options['workers'], 4)
+        self.assertEqual(options['cheaper'], 1)
+        self.assertEqual(options['cheaper-initial'], 2)
+        self.assertEqual(options['reload-on-rss'], 192)
+        self.assertEqual(options['max-requests'], 5000)
+
+    def test_workers_capped_by_memory(self):
+        options = server_config.uwsgi_options(8, 512 * server_config.MB, {})
+
+        # (512MB - 128MB reserved) / 192MB per worker
+        self.assertEqual(options['workers'], 2)
+
+    def test_single_worker_not_cheapened(self):
+        options = server_config.uwsgi_options(0.25, 256 * server_config.MB, {})
+
+        self.assertEqual(options['workers'], 1)
+        self.assertNotIn('cheaper', options)
+
+    def test_env_overrides(self):
+        options = server_config.uwsgi_options(2, 8 * GB, env={
+            'UWSGI_WORKERS': '6',
+            'UWSGI_THREADS': '4',
+            'UWSGI_RELOAD_ON_RSS_MB': '300',
+            'UWSGI_MAX_REQUESTS': '100',
+        })
+
+        self.assertEqual(options['workers'], 6)
+        self.assertEqual(options['threads'], 4)
+        self.assertEqual(options['reload-on-rss'], 300)
+        self.assertEqual(options['max-requests'], 100)
+
+
+@patch('core.server_config.memory_limit', return_value=8 * GB)
+@patch('core.server_config.cpu_limit', return_value=2)
+class UwsgiConfigCommandTests(SimpleTestCase):
+    def test_ini_printed(self, patched_cpu, patched_memory):
+        out = StringIO()
+
+        call_command('uwsgi_config', '--threads', '3', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], '# Generated for 2 CPU(s) and 8192MB')
+        self.assertEqual(lines[1], '[uwsgi]')
+        self.assertIn('socket = :9000', lines)
+        self.assertIn('workers = 4', lines)
+        self.assertIn('threads = 3', lines)
+        self.assertIn('master = true', lines)
+
+    def test_ini_written(self, patched_cpu, patched_memory):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'uwsgi.ini')
+
+            call_command(
+                'uwsgi_config', '--http-socket', '127.0.0.1:9100',
+                '--output', path, stdout=StringIO(),
+            )
+
+            with open(path) as ini:
+                lines = ini.read().splitlines()
+        self.assertIn('http-socket = 127.0.0.1:9100', lines)
+        self.assertNotIn('socket = :9000', lines)
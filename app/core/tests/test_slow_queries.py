@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import slow_queries
+from core.models import Tag
+
+
+def logged_entries(logs):
+    return [json.loads(record.getMessage()) for record in logs.records]
+
+
+class NormalizeTests(SimpleTestCase):
+    def test_literals_and_lists_normalized(self):
+        sql = (
+            "SELECT *  FROM \"core_tag\"\n WHERE name = 'it''s' "
+            "AND id IN (%s, %s, %s) LIMIT 21"
+        )
+
+        self.assertEqual(
+            slow_queries.normalize(sql),
+            'SELECT * FROM "core_tag" WHERE name = ? AND id IN (...) LIMIT ?'
+        )
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            slow_queries.fingerprint(slow_queries.normalize(
+                'SELECT 1 FROM t WHERE id IN (%s, %s)'
+            )),
+            slow_queries.fingerprint(slow_queries.normalize(
+                'SELECT 2 FROM t WHERE id IN (%s)'
+            )),
+        )
+
+
+@override_settings(SLOW_QUERY_EXPLAIN_SAMPLE_RATE=0)
+class SlowQueryLogTests(TestCase):
+    def test_slow_queries_logged_with_view(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        # Only here, queries of the test setup would log to stdout
+        with self.settings(
+            SLOW_QUERY_THRESHOLD_MS=0,
+        ), self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            client.get(reverse('recipe:tag-list'))
+
+        entry = logged_entries(logs)[-1]
+        self.assertEqual(entry['view'], 'recipe:tag-list')
+        self.assertIn('FROM "core_tag"', entry['sql'])
+        self.assertNotIn('plan', entry)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=10000)
+    def test_fast_queries_not_logged(self):
+        with self.assertNoLogs('core.slow_queries'):
+            list(Tag.objects.all())
+
+
+class SlowQueryExplainTests(TransactionTestCase):
+    def setUp(self):
+        slow_queries._last_explained.clear()
+
+    def test_sampled_queries_explained_once_per_interval(self):
+        with self.settings(
+            SLOW_QUERY_THRESHOLD_MS=0,
+            SLOW_QUERY_EXPLAIN_SAMPLE_RATE=1,
+            SLOW_QUERY_EXPLAIN_INTERVAL=300,
+        ), self.assertLogs('core.slow_queries', 'WARNING') as logs:
+            list(Tag.objects.filter(name='Vegan'))
+            list(Tag.objects.filter(name='Dessert'))
+
+        first, second = logged_entries(logs)
+        self.assertIn('Buffers', first['plan'])
+        self.assertIn('actual time', first['plan'])
+        self.assertNotIn('plan', second)
+
+    def test_failed_explain_does_not_break_transaction(self):
+        with transaction.atomic():
+            Tag.objects.exists()
+
+            plan = slow_queries.explain(
+                connection, 'SELECT missing_column FROM core_tag', []
+            )
+
+            self.assertIsNone(plan)
+            self.assertFalse(Tag.objects.exists())
+
+
+class SlowQueriesCommandTests(SimpleTestCase):
+    def write_log(self, path, entries):
+        with open(path, 'w') as log:
+            for entry in entries:
+                log.write(json.dumps(entry) + '\n')
+
+    def test_worst_fingerprints_summarized(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'slow_queries.log')
+            self.write_log(f'{path}.1', [
+                {'fingerprint': 'aaa', 'sql': 'SELECT a', 'duration_ms': 300,
+                 'view': 'recipe:recipe-list', 'plan': 'Seq Scan old'},
+            ])
+            self.write_log(path, [
+                {'fingerprint': 'aaa', 'sql': 'SELECT a', 'duration_ms': 500,
+                 'view': 'recipe:recipe-list', 'plan': 'Seq Scan new'},
+                {'fingerprint': 'bbb', 'sql': 'SELECT b', 'duration_ms': 250,
+                 'view': 'recipe:tag-list'},
+            ])
+            out = StringIO()
+
+            call_command(
+                'slow_queries', file=path, plans=True, stdout=out
+            )
+
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('aaa  count=2  total=800.0ms'))
+        self.assertIn('views=recipe:recipe-list', lines[0])
+        self.assertEqual(lines[2].strip(), 'Seq Scan new')
+        self.assertTrue(lines[3].startswith('bbb  count=1'))
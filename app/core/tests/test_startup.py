@@ -0,0 +1,101 @@
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import MagicMock, call, patch
+
+import psycopg2
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import startup
+
+
+@patch('core.startup.time.sleep')
+@patch('core.startup.psycopg2.connect')
+class WaitForDatabaseTests(SimpleTestCase):
+    def test_retries_with_backoff(self, patched_connect, patched_sleep):
+        patched_connect.side_effect = [
+            psycopg2.OperationalError, psycopg2.OperationalError, MagicMock()
+        ]
+
+        attempts = startup.wait_for_database(timeout=10)
+
+        self.assertEqual(attempts, 3)
+        self.assertEqual(patched_sleep.call_args_list, [call(0.05), call(0.1)])
+
+    def test_gives_up_after_timeout(self, patched_connect, patched_sleep):
+        patched_connect.side_effect = psycopg2.OperationalError
+
+        with self.assertRaises(psycopg2.OperationalError):
+            startup.wait_for_database(timeout=0)
+
+
+@patch('core.startup.call_command')
+class CollectStaticTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(STATIC_ROOT=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_skipped_when_files_unchanged(self, patched_call_command):
+        startup.collect_static(StringIO())
+
+        with self.assertRaises(startup.StepSkipped):
+            startup.collect_static(StringIO())
+
+        patched_call_command.assert_called_once()
+        self.assertTrue(os.path.exists(startup.static_manifest_path()))
+
+    def test_collected_when_files_change(self, patched_call_command):
+        startup.collect_static(StringIO())
+
+        with patch(
+            'core.startup.static_fingerprint', return_value='changed'
+        ):
+            startup.collect_static(StringIO())
+
+        self.assertEqual(patched_call_command.call_count, 2)
+
+
+class MigrateTests(TestCase):
+    @patch('core.startup.call_command')
+    def test_skipped_without_unapplied_migrations(self, patched_call_command):
+        with self.assertRaises(startup.StepSkipped):
+            startup.migrate(StringIO())
+
+        patched_call_command.assert_not_called()
+
+
+@patch('core.startup.collect_static')
+@patch('core.startup.migrate')
+@patch('core.startup.wait_for_database', return_value=2)
+class StartupCommandTests(SimpleTestCase):
+    def test_timings_reported(self, patched_wait, patched_migrate,
+                              patched_collect_static):
+        patched_migrate.side_effect = startup.StepSkipped(
+            'no unapplied migrations'
+        )
+        patched_collect_static.return_value = None
+        out = StringIO()
+
+        call_command('startup', stdout=out)
+
+        lines = {
+            line.split()[0]: line for line in out.getvalue().splitlines()
+        }
+        self.assertIn('available after 2 attempt(s)', lines['database'])
+        self.assertIn('skipped, no unapplied migrations', lines['migrate'])
+        self.assertIn('done', lines['collectstatic'])
+        self.assertIn('total', lines)
+
+    def test_database_unavailable(self, patched_wait, patched_migrate,
+                                  patched_collect_static):
+        patched_wait.side_effect = psycopg2.OperationalError('refused')
+
+        with self.assertRaisesMessage(CommandError, 'Database unavailable'):
+            call_command('startup', stdout=StringIO())
+
+        patched_migrate.assert_not_called()
@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock, patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import LoadSheddingMiddleware
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates,
+    })
+
+
+@patch('core.throttling.TokenBucketThrottle.timer', return_value=1000.0)
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create(self):
+        return self.client.post(
+            RECIPES_URL, {'title': 'Soup', 'time_minutes': 10, 'price': '5'}
+        )
+
+    @throttle_rates(recipe_create='2/min')
+    def test_action_bucket_refills(self, patched_timer):
+        self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+
+        response = self._create()
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(response['Retry-After'], '30')
+        # Other actions only count against the per-user bucket
+        self.assertEqual(
+            self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK
+        )
+
+        patched_timer.return_value += 30
+        self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+
+    @throttle_rates(user='1/min')
+    def test_buckets_are_per_user(self, patched_timer):
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            email='other@example.com', password='pass123'
+        ))
+
+        self.assertEqual(
+            self.client.get(TAGS_URL).status_code, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            self.client.get(TAGS_URL).status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertEqual(other.get(TAGS_URL).status_code, status.HTTP_200_OK)
+
+
+class LoadSheddingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_sheds_when_listen_queue_is_deep(self):
+        uwsgi = MagicMock(**{'listen_queue.return_value': 90})
+        get_response = MagicMock()
+        middleware = LoadSheddingMiddleware(get_response)
+
+        with patch('core.throttling.uwsgi', uwsgi), \
+                override_settings(LOAD_SHED_QUEUE_DEPTH=80):
+            response = middleware(self.factory.get(RECIPES_URL))
+            metrics = middleware(self.factory.get('/metrics'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+        get_response.assert_called_once()
+        self.assertIs(metrics, get_response.return_value)
+
+    @override_settings(LOAD_SHED_MAX_IN_FLIGHT=1)
+    def test_sheds_over_in_flight_limit(self):
+        def get_response(request):
+            # A second request arrives while the first is in progress
+            nested.append(middleware(self.factory.get(RECIPES_URL)))
+            return HttpResponse()
+
+        nested = []
+        middleware = LoadSheddingMiddleware(get_response)
+
+        self.assertEqual(
+            middleware(self.factory.get(RECIPES_URL)).status_code, 200
+        )
+        self.assertEqual(nested[0].status_code, 503)
+        self.assertEqual(middleware.in_flight, 0)
@@ -0,0 +1,78 @@
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.timing import RequestTimings
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+
+
+def create_user(email='user@example.com', password='pass123'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def timing_names(header):
+    return [metric.split(';')[0] for metric in header.split(', ')]
+
+
+class RequestTimingsTests(SimpleTestCase):
+    def test_header(self):
+        timings = RequestTimings()
+        timings.queries = 3
+        timings.add('db', 0.0042)
+        timings.add('total', 0.01)
+
+        self.assertEqual(
+            timings.header(),
+            'db;dur=4.2;desc="3 queries", total;dur=10.0'
+        )
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_recipe_list_timings(self):
+        Recipe.objects.create(
+            user=self.user,
+            title='Soup',
+            time_minutes=10,
+            price=Decimal('2.00'),
+        )
+
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            timing_names(res['Server-Timing']),
+            ['db', 'serialize', 'view', 'render', 'total'],
+        )
+        self.assertIn('desc="3 queries"', res['Server-Timing'])
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['view'], 'RecipeViewSet.list')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], 3)
+        self.assertGreaterEqual(line['total_ms'], line['view_ms'])
+
+    def test_user_view_timings(self):
+        with self.assertLogs('core.timing', 'INFO'):
+            res = self.client.patch(ME_URL, {'name': 'New name'})
+
+        self.assertIn('serialize', timing_names(res['Server-Timing']))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_not_timed(self):
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
@@ -0,0 +1,176 @@
+"""
+Token bucket throttles and queue-depth load shedding.
+
+A bucket holds up to N tokens for a rate of "N/period" and refills at
+that rate, so a client can burst N requests and then continue at the
+sustained rate. Buckets live in the default cache, which must be shared
+by the workers (see CACHE_URL) for the limits to hold across them. As
+with DRF's own throttles a bucket is read and written without a lock,
+so concurrent requests of one client can overdraw it slightly.
+
+LoadSheddingMiddleware answers 503 with Retry-After, before sessions,
+authentication or any query, once uwsgi's listen queue or the requests
+in flight in this process pass their limits.
+"""
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.metrics import REQUESTS_SHED
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_rate(self):
+        # Read on each request so that settings overrides apply
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+        tokens = min(
+            self.num_requests,
+            tokens + (now - updated) * self.num_requests / self.duration,
+        )
+        if tokens < 1:
+            self.wait_seconds = (
+                (1 - tokens) * self.duration / self.num_requests
+            )
+            return self.throttle_failure()
+
+        # An untouched bucket is full again after one period
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return self.throttle_success()
+
+    def throttle_success(self):
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """One bucket per user, or per client IP for anonymous requests."""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class ActionTokenBucketThrottle(UserTokenBucketThrottle):
+    """
+    Per-user buckets for expensive actions, named by the view's
+    throttle_scopes, e.g. {'create': 'recipe_create'}.
+    """
+
+    def __init__(self):
+        # The scope depends on the view, see allow_request
+        pass
+
+    def allow_request(self, request, view):
+        action = getattr(view, 'action', None) or request.method.lower()
+        self.scope = getattr(view, 'throttle_scopes', {}).get(action)
+        if self.scope is None:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+
+class LoadSheddingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def overloaded(self):
+        if (
+            uwsgi is not None
+            and settings.LOAD_SHED_QUEUE_DEPTH
+            and uwsgi.listen_queue() >= settings.LOAD_SHED_QUEUE_DEPTH
+        ):
+            return 'queue'
+
+        if (
+            settings.LOAD_SHED_MAX_IN_FLIGHT
+            and self.in_flight >= settings.LOAD_SHED_MAX_IN_FLIGHT
+        ):
+            return 'in_flight'
+
+        return None
+
+    def admit(self):
+        # Returns the 503 response for a shed request, None otherwise
+        with self.lock:
+            reason = self.overloaded()
+            if reason is None:
+                self.in_flight += 1
+                return None
+
+        REQUESTS_SHED.labels(reason).inc()
+        response = JsonResponse(
+            {'detail': 'Server overloaded, retry later.'}, status=503
+        )
+        response['Retry-After'] = str(settings.LOAD_SHED_RETRY_AFTER)
+        return response
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if request.path_info in settings.LOAD_SHED_EXEMPT_PATHS:
+            return self.get_response(request)
+
+        response = self.admit()
+        if response is not None:
+            return response
+
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    async def __acall__(self, request):
+        if request.path_info in settings.LOAD_SHED_EXEMPT_PATHS:
+            return await self.get_response(request)
+
+        response = self.admit()
+        if response is not None:
+            return response
+
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release()
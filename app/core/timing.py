@@ -0,0 +1,186 @@
+"""
+Per-request timings, sent as a Server-Timing header and logged as JSON.
+
+ServerTimingMiddleware decides whether a request is sampled and reports
+its total time. ServerTimingMixin adds the DB, serializer, view and
+render time of a DRF view. Requests that are not sampled skip all of it.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+def view_name(view, request):
+    # 'RecipeViewSet.list' for viewset actions, 'SyncView.get' otherwise
+    return '.'.join(filter(None, [
+        type(view).__name__,
+        getattr(view, 'action', None) or request.method.lower(),
+    ]))
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self.view_name = None
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name, func):
+        def wrapper(*args, **kwargs):
+            with self.time(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper()
+        self.queries += 1
+        with self.time('db'):
+            return execute(sql, params, many, context)
+
+    def header(self):
+        metrics = []
+        for name, seconds in self.durations.items():
+            metric = f'{name};dur={seconds * 1000:.1f}'
+            if name == 'db':
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'view': self.view_name,
+            'queries': self.queries,
+            **{
+                f'{name}_ms': round(seconds * 1000, 2)
+                for name, seconds in self.durations.items()
+            },
+        }
+
+
+class TimedRenderer:
+    """Proxy for a response's renderer that records the render time."""
+
+    def __init__(self, renderer, timings):
+        self._renderer = renderer
+        self._timings = timings
+
+    def __getattr__(self, name):
+        return getattr(self._renderer, name)
+
+    def render(self, *args, **kwargs):
+        with self._timings.time('render'):
+            return self._renderer.render(*args, **kwargs)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = request.server_timing = RequestTimings()
+        with timings.time('total'):
+            response = self.get_response(request)
+
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        timings = request.server_timing = RequestTimings()
+        with timings.time('total'):
+            response = await self.get_response(request)
+
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        response['Server-Timing'] = timings.header()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings.as_dict(),
+        }))
+
+        return response
+
+
+class ServerTimingMixin:
+    """Record where a DRF view spends its time on sampled requests."""
+
+    def _timings(self):
+        request = getattr(self, 'request', None)
+        return getattr(request, 'server_timing', None)
+
+    def dispatch(self, request, *args, **kwargs):
+        timings = getattr(request, 'server_timing', None)
+        if timings is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        # Connections are per thread, so the wrapper is installed where
+        # the view runs rather than in the middleware
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(timings)
+                )
+            with timings.time('view'):
+                response = super().dispatch(request, *args, **kwargs)
+
+        timings.view_name = view_name(self, request)
+        return response
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        timings = self._timings()
+        if timings is not None:
+            for name in ['is_valid', 'to_representation']:
+                setattr(serializer, name, timings.timed(
+                    'serialize', getattr(serializer, name)
+                ))
+
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        timings = self._timings()
+        if timings is not None and hasattr(response, 'accepted_renderer'):
+            response.accepted_renderer = TimedRenderer(
+                response.accepted_renderer, timings
+            )
+
+        return response
@@ -0,0 +1,19 @@
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.db.pool import pool_stats
+
+
+@extend_schema(responses=OpenApiTypes.OBJECT)
+class DatabasePoolView(APIView):
+    """Connection pool metrics of the worker serving the request."""
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'pools': pool_stats()})
+
@@ -0,0 +1,170 @@
+"""
+Set-based bulk updates, deletes and merges of a user's recipes, tags and
+ingredients.
+
+The signal handlers in recipe.signals keep recipe counts, tombstones,
+change events and the similarity index in step with single writes, one
+object at a time. These functions run a fixed number of statements for
+the whole selection instead and bring the same state up to date
+themselves. Tombstones are written in batches of TOMBSTONE_BATCH_SIZE.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from recipe import events
+from recipe.similarity import index_cache
+
+
+TOMBSTONE_BATCH_SIZE = 1000
+
+
+def _delete_returning(table, where, column, ids):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {where} = ANY(%s) RETURNING {column}',
+            [ids],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _locked_ids(queryset):
+    # Row locks keep concurrent writes from changing the selection
+    return list(
+        queryset.order_by('id').select_for_update().values_list(
+            'id', flat=True
+        )
+    )
+
+
+def _record_deletes(user_id, kind, ids):
+    Tombstone.objects.record(
+        user_id, kind, ids, batch_size=TOMBSTONE_BATCH_SIZE
+    )
+    events.publish_many(user_id, kind, 'deleted', ids)
+
+
+def _touch_recipes(user_id, recipe_ids):
+    recipe_ids = sorted(recipe_ids)
+    Recipe.objects.filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    events.publish_many(user_id, 'recipe', 'updated', recipe_ids)
+
+
+def _discard_index(user_id):
+    # Rebuilt on the next similar lookup rather than patched per recipe
+    transaction.on_commit(lambda: index_cache.discard(user_id))
+
+
+@transaction.atomic
+def delete_recipes(user_id, queryset):
+    ids = _locked_ids(queryset)
+    if not ids:
+        return 0
+
+    through_tables = [
+        (Recipe.tags.through._meta.db_table, 'tag_id', Tag),
+        (Recipe.ingredients.through._meta.db_table, 'ingredient_id',
+         Ingredient),
+    ]
+    for table, column, attr_model in through_tables:
+        attr_model.objects.lock(
+            attr_model.recipe_set.through.objects.filter(
+                recipe_id__in=ids
+            ).values(column)
+        )
+        attr_ids = _delete_returning(table, 'recipe_id', column, ids)
+        attr_model.objects.refresh_recipe_counts(attr_ids)
+    _delete_returning(Recipe._meta.db_table, 'id', 'id', ids)
+
+    _record_deletes(user_id, 'recipe', ids)
+    _discard_index(user_id)
+    return len(ids)
+
+
+@transaction.atomic
+def update_recipes(user_id, queryset, fields):
+    ids = _locked_ids(queryset)
+    if ids:
+        Recipe.objects.filter(pk__in=ids).update(
+            **fields, updated_at=timezone.now()
+        )
+        events.publish_many(user_id, 'recipe', 'updated', ids)
+
+    return len(ids)
+
+
+@transaction.atomic
+def delete_attrs(user_id, queryset):
+    model = queryset.model
+    kind = model._meta.model_name
+    ids = _locked_ids(queryset)
+    if not ids:
+        return 0
+
+    recipe_ids = _delete_returning(
+        model.recipe_set.through._meta.db_table, f'{kind}_id', 'recipe_id', ids
+    )
+    _delete_returning(model._meta.db_table, 'id', 'id', ids)
+
+    _touch_recipes(user_id, recipe_ids)
+    _record_deletes(user_id, kind, ids)
+    if recipe_ids:
+        _discard_index(user_id)
+    return len(ids)
+
+
+@transaction.atomic
+def update_attrs(user_id, queryset, fields):
+    model = queryset.model
+    ids = _locked_ids(queryset)
+    if ids:
+        model.objects.filter(pk__in=ids).update(
+            **fields, updated_at=timezone.now()
+        )
+        events.publish_many(user_id, model._meta.model_name, 'updated', ids)
+
+    return len(ids)
+
+
+@transaction.atomic
+def merge_attrs(user_id, target, source_ids, name=None):
+    """
+    Move the recipe links of the source tags or ingredients to target and
+    delete the sources, optionally renaming target.
+    """
+    model = type(target)
+    kind = model._meta.model_name
+    locked = _locked_ids(
+        model.objects.filter(user_id=user_id, pk__in=[target.pk, *source_ids])
+    )
+    ids = [pk for pk in locked if pk != target.pk]
+
+    table = model.recipe_set.through._meta.db_table
+    column = f'{kind}_id'
+    recipe_ids = set()
+    if ids:
+        with connection.cursor() as cursor:
+            # Recipes already linked to target keep their single link
+            cursor.execute(
+                f'INSERT INTO {table} (recipe_id, {column}) '
+                f'SELECT DISTINCT recipe_id, %s FROM {table} '
+                f'WHERE {column} = ANY(%s) '
+                f'ON CONFLICT (recipe_id, {column}) DO NOTHING',
+                [target.pk, ids],
+            )
+        recipe_ids = _delete_returning(table, column, 'recipe_id', ids)
+        _delete_returning(model._meta.db_table, 'id', 'id', ids)
+
+        model.objects.refresh_recipe_counts([target.pk])
+        _touch_recipes(user_id, recipe_ids)
+        _record_deletes(user_id, kind, ids)
+        if recipe_ids:
+            _discard_index(user_id)
+
+    if name is not None:
+        model.objects.filter(pk=target.pk).update(
+            name=name, updated_at=timezone.now()
+        )
+        events.publish(user_id, kind, 'updated', target.pk)
+
+    return len(ids)
@@ -0,0 +1,202 @@
+"""
+Per-user change events for recipes, tags and ingredients.
+
+Events are published after commit and fanned out to the subscribers of
+the event's user. InProcessBroker only reaches subscribers in the same
+process; PostgresBroker relays events through LISTEN/NOTIFY so that
+writes made by the uwsgi workers reach the ASGI process serving the
+event streams.
+"""
+import asyncio
+import json
+import threading
+from functools import partial
+
+import psycopg2
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    def __init__(self, user_id, loop, maxsize):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, event):
+        if self.queue.full():
+            # The client fell behind, tell it to resync instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': 'resync'}
+
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    async def subscribe(self, user_id):
+        subscription = Subscription(
+            user_id,
+            asyncio.get_running_loop(),
+            settings.RECIPE_EVENTS_QUEUE_SIZE,
+        )
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, event):
+        self.deliver(event)
+
+    def publish_many(self, events):
+        for event in events:
+            self.deliver(event)
+
+    def deliver(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event['user'], ()))
+
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+
+class PostgresBroker(InProcessBroker):
+    channel = 'recipe_events'
+    reconnect_delay = 1
+    # NOTIFY payloads must stay under 8000 bytes
+    batch_size = 50
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        self._connecting = None
+        self._loop = None
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)',
+                [self.channel, json.dumps(event)]
+            )
+
+    def publish_many(self, events):
+        # A list per notification instead of one notification per event
+        with connection.cursor() as cursor:
+            for start in range(0, len(events), self.batch_size):
+                cursor.execute(
+                    'SELECT pg_notify(%s, %s)',
+                    [
+                        self.channel,
+                        json.dumps(events[start:start + self.batch_size]),
+                    ]
+                )
+
+    async def subscribe(self, user_id):
+        subscription = await super().subscribe(user_id)
+        await self._listen(asyncio.get_running_loop())
+        return subscription
+
+    async def _listen(self, loop):
+        if self._listener is not None:
+            return
+
+        # Subscribers arriving during a connection attempt wait for it
+        # rather than starting their own
+        if self._connecting is None:
+            self._loop = loop
+            self._connecting = loop.create_task(self._connect())
+        await asyncio.shield(self._connecting)
+
+    def _open_listener(self):
+        params = connections['default'].get_connection_params()
+        listener = psycopg2.connect(**params)
+        listener.autocommit = True
+        with listener.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+
+        return listener
+
+    async def _connect(self):
+        # Connecting blocks until the database answers or the attempt
+        # times out, so it runs in a thread and the streams already
+        # open keep being served meanwhile
+        try:
+            listener = await self._loop.run_in_executor(
+                None, self._open_listener
+            )
+        except psycopg2.Error:
+            self._loop.call_later(self.reconnect_delay, self._reconnect)
+            return
+        finally:
+            self._connecting = None
+
+        self._loop.add_reader(listener.fileno(), self._on_notify)
+        self._listener = listener
+
+    def _reconnect(self):
+        if self._listener is None and self._connecting is None:
+            self._connecting = self._loop.create_task(self._connect())
+
+    def _on_notify(self):
+        try:
+            self._listener.poll()
+        except psycopg2.Error:
+            self._loop.remove_reader(self._listener.fileno())
+            self._listener.close()
+            self._listener = None
+            self._loop.call_later(self.reconnect_delay, self._reconnect)
+            return
+
+        while self._listener.notifies:
+            notify = self._listener.notifies.pop(0)
+            payload = json.loads(notify.payload)
+            for event in payload if isinstance(payload, list) else [payload]:
+                self.deliver(event)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+
+    if _broker is None:
+        _broker = import_string(settings.RECIPE_EVENTS_BROKER)()
+
+    return _broker
+
+
+def publish(user_id, kind, action, object_id):
+    event = {
+        'user': user_id,
+        'type': kind,
+        'action': action,
+        'id': object_id,
+    }
+    transaction.on_commit(partial(get_broker().publish, event))
+
+
+def publish_many(user_id, kind, action, object_ids):
+    events = [
+        {'user': user_id, 'type': kind, 'action': action, 'id': object_id}
+        for object_id in object_ids
+    ]
+    if events:
+        transaction.on_commit(partial(get_broker().publish_many, events))
@@ -10,6 +10,12 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class IngredientCountSerializer(IngredientSerializer):
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = ['id', 'recipe_count']
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -17,9 +23,39 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = ['id', 'recipe_count']
+
+
+class SparseFieldsMixin:
+    # Keeps only the fields listed in context['fields'] and renders the
+    # expandable relations missing from context['expand'] as bare IDs
+    expandable_fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name in self.expandable_fields:
+                if name in self.fields and name not in expand:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=True,
+                        read_only=True,
+                    )
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    expandable_fields = ['tags', 'ingredients']
 
     class Meta:
         model = Recipe
@@ -31,23 +67,28 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def _get_or_create_tags(self, tags, recipe):
         auth_user = self.context['request'].user
-   
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
+        tag_objs = [
+            Tag.objects.get_or_create(
                 user=auth_user,
                 **tag, #getting all the attributes that are passed on
-            )
-            recipe.tags.add(tag_obj)
+            )[0]
+            for tag in tags
+        ]
+        # One add locks the tags together in id order, one add per tag
+        # would lock them in request order and two requests listing the
+        # same tags differently could deadlock
+        recipe.tags.add(*tag_objs)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         auth_user = self.context['request'].user
-   
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
+        ingredient_objs = [
+            Ingredient.objects.get_or_create(
                 user=auth_user,
                 **ingredient, #getting all the attributes that are passed on
-            )
-            recipe.ingredients.add(ingredient_obj)
+            )[0]
+            for ingredient in ingredients
+        ]
+        recipe.ingredients.add(*ingredient_objs)
 
 
     def create(self, validated_data):
@@ -86,6 +127,25 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description', 'image']
 
 
+class SimilarRecipeSerializer(RecipeSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['score']
+
+
+class ShoppingListIngredientSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipes = serializers.ListField(child=serializers.IntegerField())
+
+
+class ShoppingListSerializer(serializers.Serializer):
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    ingredients = ShoppingListIngredientSerializer(many=True)
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
 class RecipeImageSerializers(serializers.ModelSerializer):
     class Meta:
         model = Recipe
@@ -94,3 +154,85 @@ class RecipeImageSerializers(serializers.ModelSerializer):
         extra_kwargs = {
             'image': {'required': 'True'}
         }
+
+
+BULK_MAX_IDS = 1000
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+
+
+class RecipeAttrFilterSerializer(serializers.Serializer):
+    assigned = serializers.BooleanField(required=False)
+
+
+class BulkSelectionSerializer(serializers.Serializer):
+    # Selects objects by ID or by filter, never the whole collection
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+    )
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError(
+                'Provide either ids or filter.'
+            )
+        if 'filter' in attrs and not attrs['filter']:
+            raise serializers.ValidationError({
+                'filter': 'Provide at least one filter.'
+            })
+
+        return attrs
+
+
+class RecipeBulkDeleteSerializer(BulkSelectionSerializer):
+    filter = RecipeFilterSerializer(required=False)
+
+
+class RecipeAttrBulkDeleteSerializer(BulkSelectionSerializer):
+    filter = RecipeAttrFilterSerializer(required=False)
+
+
+class RecipeBulkFieldsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Recipe
+        fields = ['title', 'description', 'time_minutes', 'price', 'link']
+        extra_kwargs = {name: {'required': False} for name in fields}
+
+
+class RecipeBulkUpdateSerializer(RecipeBulkDeleteSerializer):
+    set = RecipeBulkFieldsSerializer()
+
+    def validate_set(self, value):
+        if not value:
+            raise serializers.ValidationError('Provide fields to update.')
+        return value
+
+
+class RecipeAttrBulkFieldsSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+
+
+class RecipeAttrBulkUpdateSerializer(RecipeAttrBulkDeleteSerializer):
+    set = RecipeAttrBulkFieldsSerializer()
+
+
+class RecipeAttrMergeSerializer(serializers.Serializer):
+    sources = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+    )
+    name = serializers.CharField(max_length=255, required=False)
+
+    def validate_sources(self, value):
+        return list(dict.fromkeys(value))
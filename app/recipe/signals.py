@@ -0,0 +1,177 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_save, pre_delete, post_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from recipe import events
+from recipe.similarity import index_cache, RecipeIndex, TAG, INGREDIENT
+
+
+def _update_index(user_id, func, *args):
+    transaction.on_commit(
+        partial(index_cache.update, user_id, func, *args)
+    )
+
+
+def _touch_recipes(user_id, recipe_ids):
+    # Link changes do not save the recipe, so bump updated_at for sync
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now()
+    )
+    # One notification per batch rather than per recipe, clearing a
+    # popular tag touches thousands
+    events.publish_many(user_id, 'recipe', 'updated', recipe_ids)
+
+
+def _recipe_links_changed(kind, attr_model, field, instance, action,
+                          reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance is a recipe, pk_set holds tag/ingredient ids
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _touch_recipes(instance.user_id, [instance.pk])
+
+        if action == 'pre_clear':
+            instance._cleared_ids = list(
+                getattr(instance, field).values_list('id', flat=True)
+            )
+            attr_model.objects.lock(instance._cleared_ids)
+            return
+
+        if action in ('pre_add', 'pre_remove'):
+            attr_model.objects.lock(pk_set)
+            return
+
+        if action == 'post_clear':
+            attr_model.objects.refresh_recipe_counts(
+                getattr(instance, '_cleared_ids', [])
+            )
+            _update_index(
+                instance.user_id, RecipeIndex.clear, instance.id, kind
+            )
+            return
+
+        if action not in ('post_add', 'post_remove'):
+            return
+
+        attr_model.objects.refresh_recipe_counts(pk_set)
+        func = RecipeIndex.add if action == 'post_add' else RecipeIndex.remove
+        for pk in pk_set:
+            _update_index(instance.user_id, func, instance.id, (kind, pk))
+        return
+
+    # instance is a tag/ingredient, pk_set holds recipe ids
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        attr_model.objects.lock([instance.id])
+
+    if action == 'pre_clear':
+        _touch_recipes(
+            instance.user_id,
+            list(instance.recipe_set.values_list('id', flat=True))
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if pk_set:
+        _touch_recipes(instance.user_id, list(pk_set))
+
+    attr_model.objects.refresh_recipe_counts([instance.id])
+
+    feature = (kind, instance.id)
+    if action == 'post_clear':
+        _update_index(instance.user_id, RecipeIndex.remove_feature, feature)
+        return
+
+    func = RecipeIndex.add if action == 'post_add' else RecipeIndex.remove
+    for pk in pk_set:
+        _update_index(instance.user_id, func, pk, feature)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(**kwargs):
+    _recipe_links_changed(TAG, Tag, 'tags', **kwargs)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(**kwargs):
+    _recipe_links_changed(INGREDIENT, Ingredient, 'ingredients', **kwargs)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, created, **kwargs):
+    if created:
+        _update_index(instance.user_id, RecipeIndex.add_recipe, instance.id)
+
+    events.publish(
+        instance.user_id,
+        'recipe',
+        'created' if created else 'updated',
+        instance.id,
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def recipe_attr_saved(sender, instance, created, **kwargs):
+    events.publish(
+        instance.user_id,
+        sender._meta.model_name,
+        'created' if created else 'updated',
+        instance.id,
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(instance, **kwargs):
+    # The through rows are removed by the delete collector without any
+    # m2m_changed signal, so remember what the recipe was linked to
+    instance._tag_ids = list(instance.tags.values_list('id', flat=True))
+    instance._ingredient_ids = list(
+        instance.ingredients.values_list('id', flat=True)
+    )
+    Tag.objects.lock(instance._tag_ids)
+    Ingredient.objects.lock(instance._ingredient_ids)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    Tag.objects.refresh_recipe_counts(getattr(instance, '_tag_ids', []))
+    Ingredient.objects.refresh_recipe_counts(
+        getattr(instance, '_ingredient_ids', [])
+    )
+    _update_index(instance.user_id, RecipeIndex.remove_recipe, instance.id)
+    Tombstone.objects.record(instance.user_id, 'recipe', [instance.id])
+    events.publish(instance.user_id, 'recipe', 'deleted', instance.id)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(instance, **kwargs):
+    _update_index(
+        instance.user_id, RecipeIndex.remove_feature, (TAG, instance.id)
+    )
+    Tombstone.objects.record(instance.user_id, 'tag', [instance.id])
+    events.publish(instance.user_id, 'tag', 'deleted', instance.id)
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(instance, **kwargs):
+    _update_index(
+        instance.user_id,
+        RecipeIndex.remove_feature,
+        (INGREDIENT, instance.id),
+    )
+    Tombstone.objects.record(instance.user_id, 'ingredient', [instance.id])
+    events.publish(instance.user_id, 'ingredient', 'deleted', instance.id)
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(instance, **kwargs):
+    # Tombstones are not cascaded, drop the ones the collector just wrote
+    Tombstone.objects.filter(user_id=instance.id).delete()
@@ -0,0 +1,175 @@
+"""
+Per-user inverted index of recipe tags and ingredients used to find
+similar recipes without scanning every pair of recipes.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core.metrics import cache_lookup
+from core.models import Recipe
+
+
+TAG = 'tag'
+INGREDIENT = 'ingredient'
+
+
+class RecipeIndex:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.features = {}  # recipe id -> {(kind, id), ...}
+        self.postings = {}  # (kind, id) -> {recipe id, ...}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, user_id):
+        index = cls(user_id)
+
+        recipe_ids = Recipe.objects.filter(
+            user_id=user_id
+        ).values_list('id', flat=True)
+        for recipe_id in recipe_ids:
+            index.features[recipe_id] = set()
+
+        tag_links = Recipe.tags.through.objects.filter(
+            recipe__user_id=user_id
+        ).values_list('recipe_id', 'tag_id')
+        for recipe_id, tag_id in tag_links:
+            index.add(recipe_id, (TAG, tag_id))
+
+        ingredient_links = Recipe.ingredients.through.objects.filter(
+            recipe__user_id=user_id
+        ).values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in ingredient_links:
+            index.add(recipe_id, (INGREDIENT, ingredient_id))
+
+        return index
+
+    @property
+    def size(self):
+        return len(self.features) + sum(
+            len(recipe_ids) for recipe_ids in self.postings.values()
+        )
+
+    def add_recipe(self, recipe_id):
+        self.features.setdefault(recipe_id, set())
+
+    def remove_recipe(self, recipe_id):
+        for feature in self.features.pop(recipe_id, ()):
+            self._unlink(recipe_id, feature)
+
+    def add(self, recipe_id, feature):
+        self.features.setdefault(recipe_id, set()).add(feature)
+        self.postings.setdefault(feature, set()).add(recipe_id)
+
+    def remove(self, recipe_id, feature):
+        self.features.get(recipe_id, set()).discard(feature)
+        self._unlink(recipe_id, feature)
+
+    def clear(self, recipe_id, kind):
+        features = self.features.get(recipe_id, set())
+        for feature in [f for f in features if f[0] == kind]:
+            self.remove(recipe_id, feature)
+
+    def remove_feature(self, feature):
+        for recipe_id in self.postings.pop(feature, ()):
+            self.features.get(recipe_id, set()).discard(feature)
+
+    def _unlink(self, recipe_id, feature):
+        recipe_ids = self.postings.get(feature)
+        if recipe_ids is not None:
+            recipe_ids.discard(recipe_id)
+            if not recipe_ids:
+                del self.postings[feature]
+
+    def similar(self, recipe_id, limit):
+        # Returns [(score, recipe id), ...] ranked by Jaccard similarity
+        own = self.features.get(recipe_id)
+        if not own:
+            return []
+
+        overlap = {}
+        for feature in own:
+            for other_id in self.postings.get(feature, ()):
+                if other_id != recipe_id:
+                    overlap[other_id] = overlap.get(other_id, 0) + 1
+
+        scored = (
+            (shared / (len(own) + len(self.features[other_id]) - shared),
+             -other_id)
+            for other_id, shared in overlap.items()
+        )
+        return [
+            (score, -neg_id)
+            for score, neg_id in heapq.nlargest(limit, scored)
+        ]
+
+
+class IndexCache:
+    """
+    LRU of per-user indexes, bounded by the total number of entries held.
+
+    Indexes are kept current by the m2m signal handlers in this process and
+    rebuilt after RECIPE_SIMILARITY_INDEX_TTL seconds to pick up writes
+    made by other workers.
+    """
+
+    def __init__(self):
+        self._indexes = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, user_id):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and not self._expired(index):
+                self._indexes.move_to_end(user_id)
+                cache_lookup('similarity_index', hit=True)
+                return index
+
+        cache_lookup('similarity_index', hit=False)
+        index = RecipeIndex.build(user_id)
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            self._evict()
+
+        return index
+
+    def similar(self, user_id, recipe_id, limit):
+        index = self.get(user_id)
+        with self._lock:
+            return index.similar(recipe_id, limit)
+
+    def update(self, user_id, func, *args):
+        # Applies an incremental change to an index only if it is loaded
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                func(index, *args)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def _expired(self, index):
+        ttl = settings.RECIPE_SIMILARITY_INDEX_TTL
+        return time.monotonic() - index.built_at > ttl
+
+    def _evict(self):
+        budget = settings.RECIPE_SIMILARITY_INDEX_MAX_ENTRIES
+        total = sum(index.size for index in self._indexes.values())
+
+        while total > budget and len(self._indexes) > 1:
+            _, index = self._indexes.popitem(last=False)
+            total -= index.size
+
+
+index_cache = IndexCache()
@@ -0,0 +1,161 @@
+"""
+Server-Sent Events stream of the authenticated user's changes.
+
+This is a plain ASGI application mounted in app/asgi.py, so an idle
+connection is a suspended coroutine rather than a blocked worker thread.
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from rest_framework.authtoken.models import Token
+
+from recipe.events import get_broker
+
+
+EVENTS_PATH = '/api/recipe/events/'
+
+
+STREAM_TOKEN_SALT = 'recipe.events'
+
+
+def issue_stream_token(user_id):
+    return signing.dumps(user_id, salt=STREAM_TOKEN_SALT)
+
+
+def _user_id_for_key(key):
+    return Token.objects.filter(
+        key=key,
+        user__is_active=True,
+    ).values_list('user_id', flat=True).first()
+
+
+def _user_id_for_stream_token(token):
+    try:
+        user_id = signing.loads(
+            token,
+            salt=STREAM_TOKEN_SALT,
+            max_age=settings.RECIPE_EVENTS_TOKEN_MAX_AGE,
+        )
+    except signing.BadSignature:
+        return None
+
+    return get_user_model().objects.filter(
+        pk=user_id, is_active=True
+    ).values_list('pk', flat=True).first()
+
+
+def _header_key(scope):
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword == 'Token' and key:
+                return key
+
+    return None
+
+
+async def authenticate(scope):
+    key = _header_key(scope)
+    if key:
+        return await sync_to_async(_user_id_for_key)(key)
+
+    # EventSource cannot send headers, so browsers pass a stream token
+    # from the stream-token endpoint instead. It only opens this stream
+    # and expires after RECIPE_EVENTS_TOKEN_MAX_AGE seconds, keeping API
+    # tokens out of access logs
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    token = query.get('token', [None])[0]
+    if not token:
+        return None
+
+    return await sync_to_async(_user_id_for_stream_token)(token)
+
+
+def format_event(event):
+    data = {key: value for key, value in event.items() if key != 'user'}
+    return f'event: {event["type"]}\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+async def _send_json(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps(body).encode(),
+    })
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _stream(subscription, send):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': b': connected\n\n',
+        'more_body': True,
+    })
+
+    while True:
+        try:
+            event = await asyncio.wait_for(
+                subscription.get(), settings.RECIPE_EVENTS_HEARTBEAT
+            )
+        except asyncio.TimeoutError:
+            body = b': keepalive\n\n'
+        else:
+            body = format_event(event)
+
+        await send({
+            'type': 'http.response.body',
+            'body': body,
+            'more_body': True,
+        })
+
+
+async def sse_application(scope, receive, send):
+    if scope['method'] != 'GET':
+        await _send_json(send, 405, {'detail': 'Method not allowed.'})
+        return
+
+    user_id = await authenticate(scope)
+    if user_id is None:
+        await _send_json(send, 401, {
+            'detail': 'Authentication credentials were not provided.'
+        })
+        return
+
+    broker = get_broker()
+    subscription = await broker.subscribe(user_id)
+    stream = asyncio.ensure_future(_stream(subscription, send))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+
+    try:
+        await asyncio.wait(
+            {stream, disconnect}, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        broker.unsubscribe(subscription)
+        stream.cancel()
+        disconnect.cancel()
@@ -0,0 +1,278 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag, Tombstone
+
+
+RECIPES_DELETE_URL = reverse('recipe:recipe-bulk-delete')
+RECIPES_UPDATE_URL = reverse('recipe:recipe-bulk-update')
+TAGS_DELETE_URL = reverse('recipe:tag-bulk-delete')
+TAGS_UPDATE_URL = reverse('recipe:tag-bulk-update')
+INGREDIENTS_DELETE_URL = reverse('recipe:ingredient-bulk-delete')
+
+
+def create_user(email='user@example.com', password='pass123'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def merge_url(view, pk):
+    return reverse(f'recipe:{view}-merge', args=[pk])
+
+
+class RecipeBulkAPITests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(
+            user=self.user, name='Kale'
+        )
+
+    def test_delete_by_ids(self):
+        recipes = [create_recipe(self.user) for _ in range(3)]
+        for recipe in recipes[:2]:
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+        other = create_recipe(create_user(email='other@example.com'))
+
+        response = self.client.post(RECIPES_DELETE_URL, {
+            'ids': [recipes[0].id, recipes[1].id, other.id],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'deleted': 2})
+        self.assertEqual(
+            set(Recipe.objects.values_list('id', flat=True)),
+            {recipes[2].id, other.id},
+        )
+        self.tag.refresh_from_db()
+        self.ingredient.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 0)
+        self.assertEqual(self.ingredient.recipe_count, 0)
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertEqual(
+            set(Tombstone.objects.filter(kind='recipe').values_list(
+                'object_id', flat=True
+            )),
+            {recipes[0].id, recipes[1].id},
+        )
+
+    def test_delete_by_filter(self):
+        tagged = create_recipe(self.user)
+        tagged.tags.add(self.tag)
+        untagged = create_recipe(self.user)
+
+        response = self.client.post(RECIPES_DELETE_URL, {
+            'filter': {'tags': [self.tag.id]},
+        }, format='json')
+
+        self.assertEqual(response.data, {'deleted': 1})
+        self.assertEqual(
+            list(Recipe.objects.values_list('id', flat=True)), [untagged.id]
+        )
+
+    def test_delete_queries_do_not_grow_with_selection(self):
+        def delete_queries(count):
+            recipes = [create_recipe(self.user) for _ in range(count)]
+            for recipe in recipes:
+                recipe.tags.add(self.tag)
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(RECIPES_DELETE_URL, {
+                    'ids': [recipe.id for recipe in recipes],
+                }, format='json')
+            return len(queries)
+
+        self.assertEqual(delete_queries(2), delete_queries(20))
+
+    def test_update(self):
+        recipes = [create_recipe(self.user) for _ in range(2)]
+        updated_at = recipes[0].updated_at
+
+        response = self.client.post(RECIPES_UPDATE_URL, {
+            'ids': [recipe.id for recipe in recipes],
+            'set': {'time_minutes': 45, 'price': '7.50'},
+        }, format='json')
+
+        self.assertEqual(response.data, {'updated': 2})
+        for recipe in recipes:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.time_minutes, 45)
+            self.assertEqual(recipe.price, Decimal('7.50'))
+            self.assertEqual(recipe.title, 'Sample recipe')
+        self.assertGreater(recipes[0].updated_at, updated_at)
+
+    def test_selection_required(self):
+        for payload in [
+            {},
+            {'ids': [1], 'filter': {'tags': [1]}},
+            {'filter': {}},
+            {'ids': []},
+        ]:
+            response = self.client.post(
+                RECIPES_DELETE_URL, payload, format='json'
+            )
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, payload
+            )
+
+    def test_update_needs_fields(self):
+        recipe = create_recipe(self.user)
+
+        response = self.client.post(RECIPES_UPDATE_URL, {
+            'ids': [recipe.id], 'set': {},
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeAttrBulkAPITests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_delete_unassigned_tags(self):
+        assigned = Tag.objects.create(user=self.user, name='Vegan')
+        unused = Tag.objects.create(user=self.user, name='Unused')
+        create_recipe(self.user).tags.add(assigned)
+
+        response = self.client.post(TAGS_DELETE_URL, {
+            'filter': {'assigned': False},
+        }, format='json')
+
+        self.assertEqual(response.data, {'deleted': 1})
+        self.assertEqual(
+            list(Tag.objects.values_list('id', flat=True)), [assigned.id]
+        )
+        self.assertTrue(Tombstone.objects.filter(
+            kind='tag', object_id=unused.id
+        ).exists())
+
+    def test_delete_assigned_ingredient_touches_recipes(self):
+        ingredient = Ingredient.objects.create(user=self.user, name='Kale')
+        recipe = create_recipe(self.user)
+        recipe.ingredients.add(ingredient)
+        recipe.refresh_from_db()
+        updated_at = recipe.updated_at
+
+        response = self.client.post(INGREDIENTS_DELETE_URL, {
+            'ids': [ingredient.id],
+        }, format='json')
+
+        self.assertEqual(response.data, {'deleted': 1})
+        self.assertFalse(recipe.ingredients.exists())
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, updated_at)
+
+    def test_rename_tags(self):
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('veg', 'Veggie')
+        ]
+        other = Tag.objects.create(
+            user=create_user(email='other@example.com'), name='veg'
+        )
+
+        response = self.client.post(TAGS_UPDATE_URL, {
+            'ids': [tag.id for tag in tags] + [other.id],
+            'set': {'name': 'Vegetarian'},
+        }, format='json')
+
+        self.assertEqual(response.data, {'updated': 2})
+        self.assertEqual(
+            set(Tag.objects.values_list('name', flat=True)),
+            {'Vegetarian', 'veg'},
+        )
+
+
+class RecipeAttrMergeAPITests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_merge_ingredients(self):
+        target, tomato, tomatoes = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Tomato', 'tomato', 'Tomatoes')
+        ]
+        both = create_recipe(self.user)
+        both.ingredients.add(target, tomato, tomatoes)
+        source_only = create_recipe(self.user)
+        source_only.ingredients.add(tomatoes)
+        untouched = create_recipe(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                merge_url('ingredient', target.id),
+                {'sources': [tomato.id, tomatoes.id], 'name': 'Tomatoes'},
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'id': target.id, 'name': 'Tomatoes', 'recipe_count': 2,
+            'merged': 2,
+        })
+        self.assertFalse(
+            Ingredient.objects.filter(id__in=[tomato.id, tomatoes.id]).exists()
+        )
+        for recipe in (both, source_only):
+            self.assertEqual(
+                list(recipe.ingredients.values_list('id', flat=True)),
+                [target.id],
+            )
+        self.assertFalse(untouched.ingredients.exists())
+        self.assertEqual(
+            Tombstone.objects.filter(kind='ingredient').count(), 2
+        )
+        self.assertFalse(any(
+            'FROM "core_recipe"' in query['sql'] and
+            query['sql'].startswith('SELECT')
+            for query in queries.captured_queries
+        ))
+
+    def test_merge_rejects_unknown_sources(self):
+        target = Tag.objects.create(user=self.user, name='Vegan')
+        other = Tag.objects.create(
+            user=create_user(email='other@example.com'), name='vegan'
+        )
+
+        response = self.client.post(
+            merge_url('tag', target.id), {'sources': [other.id]},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Tag.objects.filter(id=other.id).exists())
+
+    def test_merge_into_other_users_tag(self):
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        other = Tag.objects.create(
+            user=create_user(email='other@example.com'), name='vegan'
+        )
+
+        response = self.client.post(
+            merge_url('tag', other.id), {'sources': [tag.id]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
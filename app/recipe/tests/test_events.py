@@ -0,0 +1,306 @@
+import asyncio
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+import psycopg2
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe import events
+from recipe.sse import authenticate, sse_application
+
+
+STREAM_TOKEN_URL = reverse('recipe:stream-token')
+
+
+def create_user(email='user@example.com', password='pass123'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class BrokerTests(SimpleTestCase):
+    def test_events_delivered_to_user_subscriptions(self):
+        broker = events.InProcessBroker()
+
+        async def scenario():
+            mine = await broker.subscribe(1)
+            other = await broker.subscribe(2)
+            broker.publish({'user': 1, 'type': 'recipe', 'id': 5})
+
+            event = await asyncio.wait_for(mine.get(), 1)
+            self.assertEqual(event['id'], 5)
+            self.assertTrue(other.queue.empty())
+
+            broker.unsubscribe(mine)
+            broker.publish({'user': 1, 'type': 'recipe', 'id': 6})
+            await asyncio.sleep(0)
+            self.assertTrue(mine.queue.empty())
+
+        asyncio.run(scenario())
+
+    @patch('django.conf.settings.RECIPE_EVENTS_QUEUE_SIZE', 2)
+    def test_slow_subscriber_gets_resync(self):
+        broker = events.InProcessBroker()
+
+        async def scenario():
+            subscription = await broker.subscribe(1)
+            for recipe_id in range(3):
+                broker.publish({'user': 1, 'type': 'recipe', 'id': recipe_id})
+            await asyncio.sleep(0)
+
+            event = await asyncio.wait_for(subscription.get(), 1)
+            self.assertEqual(event, {'type': 'resync'})
+
+        asyncio.run(scenario())
+
+
+class SSEApplicationTests(SimpleTestCase):
+    def test_auth_required(self):
+        sent = []
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(sse_application(stream_scope(), receive, send))
+
+        self.assertEqual(sent[0]['status'], 401)
+
+    @patch('recipe.sse.authenticate')
+    def test_stream_sends_user_events(self, patched_authenticate):
+        patched_authenticate.return_value = 1
+        broker = events.InProcessBroker()
+        sent = []
+
+        async def scenario():
+            disconnected = asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+                if b'event: recipe' in message.get('body', b''):
+                    disconnected.set()
+
+            async def publish():
+                while not broker._subscriptions:
+                    await asyncio.sleep(0)
+                broker.publish({
+                    'user': 1, 'type': 'recipe', 'action': 'updated', 'id': 7
+                })
+
+            with patch('recipe.sse.get_broker', return_value=broker):
+                await asyncio.wait_for(asyncio.gather(
+                    sse_application(stream_scope(), receive, send),
+                    publish(),
+                ), 5)
+
+        asyncio.run(scenario())
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(
+            b'data: {"type": "recipe", "action": "updated", "id": 7}',
+            sent[-1]['body']
+        )
+        self.assertEqual(broker._subscriptions, {})
+
+
+def stream_scope(headers=(), query_string=b''):
+    return {
+        'type': 'http',
+        'method': 'GET',
+        'path': '/api/recipe/events/',
+        'headers': list(headers),
+        'query_string': query_string,
+    }
+
+
+class StreamTokenTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.key = Token.objects.create(user=self.user).key
+        self.client = APIClient()
+
+    def _stream_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+        response = self.client.post(STREAM_TOKEN_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['expires_in'], 60)
+        return response.data['token']
+
+    def test_stream_token_requires_auth(self):
+        response = self.client.post(STREAM_TOKEN_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_token_opens_stream(self):
+        token = self._stream_token()
+
+        user_id = async_to_sync(authenticate)(
+            stream_scope(query_string=f'token={token}'.encode())
+        )
+
+        self.assertEqual(user_id, self.user.id)
+
+    def test_expired_stream_token_rejected(self):
+        token = self._stream_token()
+
+        with patch('django.core.signing.time.time',
+                   return_value=time.time() + 61):
+            user_id = async_to_sync(authenticate)(
+                stream_scope(query_string=f'token={token}'.encode())
+            )
+
+        self.assertIsNone(user_id)
+
+    def test_api_token_rejected_in_query(self):
+        user_id = async_to_sync(authenticate)(
+            stream_scope(query_string=f'token={self.key}'.encode())
+        )
+
+        self.assertIsNone(user_id)
+
+    def test_api_token_accepted_in_header(self):
+        user_id = async_to_sync(authenticate)(stream_scope(
+            [(b'authorization', f'Token {self.key}'.encode())]
+        ))
+
+        self.assertEqual(user_id, self.user.id)
+
+
+class PublishTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+
+    def _published(self, patched_get_broker):
+        published = []
+        for name, args, _ in patched_get_broker.return_value.mock_calls:
+            if name == 'publish':
+                published.append(args[0])
+            elif name == 'publish_many':
+                published.extend(args[0])
+        return [
+            (event['type'], event['action'], event['id'])
+            for event in published
+        ]
+
+    @patch('recipe.events.get_broker')
+    def test_changes_published_after_commit(self, patched_get_broker):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title='Soup',
+                time_minutes=10,
+                price=Decimal('2.00'),
+            )
+            tag = Tag.objects.create(user=self.user, name='Winter')
+            recipe.tags.add(tag)
+
+        self.assertEqual(self._published(patched_get_broker), [
+            ('recipe', 'created', recipe.id),
+            ('tag', 'created', tag.id),
+            ('recipe', 'updated', recipe.id),
+        ])
+
+    @patch('recipe.events.get_broker')
+    def test_tag_clear_publishes_recipes_together(self, patched_get_broker):
+        tag = Tag.objects.create(user=self.user, name='Winter')
+        recipes = [
+            Recipe.objects.create(
+                user=self.user,
+                title=f'Soup {index}',
+                time_minutes=10,
+                price=Decimal('2.00'),
+            )
+            for index in range(3)
+        ]
+        tag.recipe_set.add(*recipes)
+        patched_get_broker.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.recipe_set.clear()
+
+        broker = patched_get_broker.return_value
+        broker.publish.assert_not_called()
+        broker.publish_many.assert_called_once()
+        self.assertEqual(
+            sorted(self._published(patched_get_broker)),
+            [('recipe', 'updated', recipe.id) for recipe in recipes],
+        )
+
+
+class PostgresBrokerTests(TransactionTestCase):
+    def test_notify_reaches_listener(self):
+        broker = events.PostgresBroker()
+
+        def publish():
+            # Stands in for a uwsgi worker writing on its own connection
+            try:
+                broker.publish(
+                    {'user': 1, 'type': 'tag', 'action': 'deleted', 'id': 3}
+                )
+            finally:
+                connection.close()
+
+        async def scenario():
+            subscription = await broker.subscribe(1)
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, publish
+                )
+                event = await asyncio.wait_for(subscription.get(), 5)
+            finally:
+                asyncio.get_running_loop().remove_reader(
+                    broker._listener.fileno()
+                )
+                broker._listener.close()
+
+            self.assertEqual(event['id'], 3)
+
+        asyncio.run(scenario())
+
+    def test_listener_connects_off_the_event_loop(self):
+        broker = events.PostgresBroker()
+        connect = psycopg2.connect
+        ticks = []
+
+        def slow_connect(**params):
+            time.sleep(0.3)
+            return connect(**params)
+
+        async def tick():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            ticker = asyncio.ensure_future(tick())
+            try:
+                # Both wait on the same connection attempt
+                await asyncio.gather(broker.subscribe(1), broker.subscribe(2))
+            finally:
+                ticker.cancel()
+                asyncio.get_running_loop().remove_reader(
+                    broker._listener.fileno()
+                )
+                broker._listener.close()
+
+        with patch('recipe.events.psycopg2.connect',
+                   side_effect=slow_connect) as patched_connect:
+            asyncio.run(scenario())
+
+        self.assertEqual(patched_connect.call_count, 1)
+        self.assertGreater(len(ticks), 10)
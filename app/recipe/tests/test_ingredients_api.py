@@ -161,4 +161,27 @@ class PrivateIngredientsAPITests(TestCase):
 
         response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(response.data), 1)
\ No newline at end of file
+        self.assertEqual(len(response.data), 1)
+
+    def test_ingredients_with_counts(self):
+        ingredient1 = Ingredient.objects.create(user=self.user, name='Flour')
+        ingredient2 = Ingredient.objects.create(user=self.user, name='Eggs')
+
+        recipe = Recipe.objects.create(
+            title='Bread',
+            time_minutes=90,
+            price=Decimal('1.20'),
+            user=self.user
+        )
+        recipe.ingredients.add(ingredient1)
+
+        response = self.client.get(INGREDIENTS_URL, {'with_counts': 1})
+
+        counts = {item['id']: item['recipe_count'] for item in response.data}
+        self.assertEqual(counts, {ingredient1.id: 1, ingredient2.id: 0})
+
+        recipe.ingredients.remove(ingredient1)
+        response = self.client.get(INGREDIENTS_URL, {'with_counts': 1})
+
+        counts = {item['id']: item['recipe_count'] for item in response.data}
+        self.assertEqual(counts, {ingredient1.id: 0, ingredient2.id: 0})
@@ -14,6 +14,7 @@ from rest_framework.test import APIClient
 from core.models import Recipe, Tag, Ingredient
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.similarity import index_cache
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
@@ -25,6 +26,12 @@ def detail_url(recipe_id):
 def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+BATCH_URL = reverse('recipe:recipe-batch')
+
 #helper function for creating a recipe
 def create_recipe(user, **params):
     defaults = {
@@ -576,6 +583,250 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(serializer2.data, response.data)
         self.assertNotIn(serializer3.data, response.data)
 
+    def test_sparse_fields(self):
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [{'id': recipe.id, 'title': recipe.title}]
+        )
+
+    def test_sparse_fields_unknown_field(self):
+        response = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expand_relations(self):
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        params = {'fields': 'id,tags,ingredients', 'expand': 'ingredients'}
+        response = self.client.get(detail_url(recipe.id), params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tags'], [tag.id])
+        self.assertEqual(
+            response.data['ingredients'],
+            [{'id': ingredient.id, 'name': ingredient.name}]
+        )
+
+    def test_list_prefetches_relations(self):
+        for _ in range(3):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(response.data), 3)
+
+    def test_filter_malformed_ids_returns_error(self):
+        response = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', response.data)
+
+    def test_batch_preserves_order_and_reports_missing(self):
+        recipe1 = create_recipe(user=self.user, title='First')
+        recipe2 = create_recipe(user=self.user, title='Second')
+        other_user = create_user(
+            email='other@example.com',
+            password='password123'
+        )
+        other_recipe = create_recipe(user=other_user)
+
+        ids = [recipe2.id, other_recipe.id, recipe1.id, 999999]
+        response = self.client.get(
+            BATCH_URL, {'ids': ','.join(str(i) for i in ids)}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            RecipeDetailSerializer([recipe2, recipe1], many=True).data
+        )
+        self.assertEqual(response.data['missing'], [other_recipe.id, 999999])
+
+    def test_batch_invalid_ids(self):
+        for params in [{}, {'ids': '1,,2'}, {'ids': 'one'}]:
+            response = self.client.get(BATCH_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_batch_id_cap(self):
+        ids = ','.join(str(i) for i in range(1, 202))
+        response = self.client.get(BATCH_URL, {'ids': ids})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SimilarRecipeAPITests(TestCase):
+    def setUp(self):
+        index_cache.clear()
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+
+    def test_similar_recipes_ranked_by_overlap(self):
+        recipe = create_recipe(user=self.user, title='Curry')
+        recipe.tags.add(self.vegan, self.dinner)
+        recipe.ingredients.add(self.rice)
+
+        close = create_recipe(user=self.user, title='Risotto')
+        close.tags.add(self.vegan, self.dinner)
+
+        far = create_recipe(user=self.user, title='Salad')
+        far.tags.add(self.vegan)
+
+        create_recipe(user=self.user, title='Toast')
+
+        response = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in response.data],
+            [close.id, far.id]
+        )
+        self.assertAlmostEqual(response.data[0]['score'], 2 / 3)
+        self.assertAlmostEqual(response.data[1]['score'], 1 / 3)
+
+    def test_similar_recipes_limited_to_user(self):
+        other_user = create_user(
+            email='other@example.com',
+            password='password123'
+        )
+        other_tag = Tag.objects.create(user=other_user, name='Vegan')
+        other_recipe = create_recipe(user=other_user)
+        other_recipe.tags.add(other_tag, self.vegan)
+
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(self.vegan)
+
+        response = self.client.get(similar_url(recipe.id))
+        self.assertEqual(response.data, [])
+
+        response = self.client.get(similar_url(other_recipe.id))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_similar_recipes_limit(self):
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(self.vegan)
+        for _ in range(3):
+            create_recipe(user=self.user).tags.add(self.vegan)
+
+        response = self.client.get(similar_url(recipe.id), {'limit': 2})
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.get(similar_url(recipe.id), {'limit': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_updated_from_m2m_changes(self):
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(self.vegan)
+        other = create_recipe(user=self.user)
+
+        response = self.client.get(similar_url(recipe.id))
+        self.assertEqual(response.data, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.tags.add(self.vegan)
+
+        response = self.client.get(similar_url(recipe.id))
+        self.assertEqual([item['id'] for item in response.data], [other.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vegan.delete()
+
+        response = self.client.get(similar_url(recipe.id))
+        self.assertEqual(response.data, [])
+
+
+class ShoppingListAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_shopping_list_merges_ingredients(self):
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        fish = Ingredient.objects.create(user=self.user, name='Fish')
+
+        recipe1 = create_recipe(user=self.user, price=Decimal('2.50'))
+        recipe1.ingredients.add(salt, rice)
+        recipe2 = create_recipe(user=self.user, price=Decimal('4.00'))
+        recipe2.ingredients.add(salt, fish)
+        recipe3 = create_recipe(user=self.user)
+        recipe3.ingredients.add(fish)
+
+        params = {'recipes': f'{recipe1.id},{recipe2.id}'}
+        response = self.client.get(SHOPPING_LIST_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipes'], [recipe1.id, recipe2.id])
+        self.assertEqual(response.data['total_price'], '6.50')
+        self.assertEqual(
+            [dict(item) for item in response.data['ingredients']],
+            [
+                {'id': fish.id, 'name': 'Fish', 'recipes': [recipe2.id]},
+                {'id': rice.id, 'name': 'Rice', 'recipes': [recipe1.id]},
+                {
+                    'id': salt.id,
+                    'name': 'Salt',
+                    'recipes': [recipe1.id, recipe2.id]
+                },
+            ]
+        )
+
+    def test_shopping_list_limited_to_user(self):
+        other_user = create_user(
+            email='other@example.com',
+            password='password123'
+        )
+        other_recipe = create_recipe(user=other_user)
+        other_recipe.ingredients.add(
+            Ingredient.objects.create(user=other_user, name='Salt')
+        )
+
+        params = {'recipes': f'{other_recipe.id}'}
+        response = self.client.get(SHOPPING_LIST_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipes'], [])
+        self.assertEqual(response.data['ingredients'], [])
+        self.assertEqual(response.data['total_price'], '0.00')
+
+    def test_shopping_list_requires_recipes(self):
+        response = self.client.get(SHOPPING_LIST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_shopping_list_recipe_cap(self):
+        ids = ','.join(str(i) for i in range(1, 52))
+        response = self.client.get(SHOPPING_LIST_URL, {'recipes': ids})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ImageUploadTests(TestCase):
 
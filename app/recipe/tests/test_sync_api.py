@@ -0,0 +1,209 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def create_user(email='user@example.com', password='pass123'):
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe title',
+        'time_minutes': 22,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicSyncAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        response = self.client.get(SYNC_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class PrivateSyncAPITests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_initial_sync_returns_everything(self):
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Tofu')
+
+        other_user = create_user(email='other@example.com')
+        create_recipe(user=other_user)
+
+        response = self.client.get(SYNC_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in response.data['recipes']], [recipe.id]
+        )
+        self.assertEqual([t['id'] for t in response.data['tags']], [tag.id])
+        self.assertEqual(
+            [i['id'] for i in response.data['ingredients']],
+            [ingredient.id]
+        )
+        self.assertEqual(response.data['deleted'], [])
+        self.assertFalse(response.data['has_more'])
+
+    def test_sync_pages_by_keyset(self):
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        tags = [
+            Tag.objects.create(user=self.user, name=f'Tag {i}')
+            for i in range(2)
+        ]
+
+        seen_recipes, seen_tags = [], []
+        params = {'limit': 2}
+        while True:
+            response = self.client.get(SYNC_URL, params)
+            seen_recipes += [r['id'] for r in response.data['recipes']]
+            seen_tags += [t['id'] for t in response.data['tags']]
+            params['since'] = response.data['next']
+            if not response.data['has_more']:
+                break
+
+        self.assertEqual(seen_recipes, [recipe.id for recipe in recipes])
+        self.assertEqual(seen_tags, [tag.id for tag in tags])
+
+    def test_sync_pages_through_rows_past_retention(self):
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        Recipe.objects.update(
+            updated_at=timezone.now() - timedelta(days=200)
+        )
+
+        seen = []
+        params = {'limit': 2}
+        while True:
+            response = self.client.get(SYNC_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += [r['id'] for r in response.data['recipes']]
+            params['since'] = response.data['next']
+            if not response.data['has_more']:
+                break
+
+        self.assertEqual(seen, [recipe.id for recipe in recipes])
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_sync_token_past_retention_expired(self):
+        create_recipe(user=self.user)
+        token = self.client.get(SYNC_URL).data['next']
+
+        with patch('recipe.views.timezone.now',
+                   return_value=timezone.now() + timedelta(days=31)):
+            response = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_sync_returns_only_changes_since_token(self):
+        recipe = create_recipe(user=self.user)
+        unchanged = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        token = self.client.get(SYNC_URL).data['next']
+
+        recipe.title = 'New title'
+        recipe.save()
+        tag_id = tag.id
+        tag.delete()
+
+        response = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(
+            [r['id'] for r in response.data['recipes']], [recipe.id]
+        )
+        self.assertEqual(response.data['tags'], [])
+        self.assertEqual(
+            response.data['deleted'],
+            [{'kind': 'tag', 'id': tag_id}]
+        )
+        self.assertNotIn(
+            unchanged.id, [r['id'] for r in response.data['recipes']]
+        )
+
+        response = self.client.get(SYNC_URL, {'since': response.data['next']})
+
+        self.assertEqual(response.data['recipes'], [])
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_link_changes_mark_recipe_updated(self):
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        token = self.client.get(SYNC_URL).data['next']
+
+        tag.recipe_set.add(recipe)
+
+        response = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(
+            [r['id'] for r in response.data['recipes']], [recipe.id]
+        )
+
+    def test_collector_deletes_leave_tombstones(self):
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        token = self.client.get(SYNC_URL).data['next']
+
+        self.user.tag_set.all().delete()
+        recipe.delete()
+
+        response = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(
+            sorted(item['kind'] for item in response.data['deleted']),
+            ['recipe', 'tag']
+        )
+
+    @override_settings(SYNC_TOMBSTONE_RETENTION_DAYS=30)
+    def test_expired_tombstones_pruned_on_delete(self):
+        other = create_user(email='other@example.com')
+        for user in (self.user, other):
+            Tombstone.objects.create(user=user, kind='recipe', object_id=1)
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=31)
+        )
+        Tombstone.objects.create(user=self.user, kind='recipe', object_id=2)
+        recipe = create_recipe(user=self.user)
+
+        recipe_id = recipe.id
+        recipe.delete()
+
+        self.assertEqual(
+            set(Tombstone.objects.values_list('user_id', 'object_id')),
+            {(other.id, 1), (self.user.id, 2), (self.user.id, recipe_id)},
+        )
+
+    def test_user_delete_removes_tombstones(self):
+        create_recipe(user=self.user)
+
+        self.user.delete()
+
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_token(self):
+        response = self.client.get(SYNC_URL, {'since': 'garbage'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
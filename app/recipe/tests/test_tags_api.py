@@ -1,8 +1,10 @@
+import threading
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.db import connections, transaction
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -135,3 +137,106 @@ class PrivateTagsAPITests(TestCase):
         response = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(response.data), 1)
+
+    def test_tags_with_counts(self):
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        tag2 = Tag.objects.create(user=self.user, name='Lunch')
+
+        recipe1 = Recipe.objects.create(
+            title='Porridge',
+            time_minutes=5,
+            price=Decimal('1.50'),
+            user=self.user
+        )
+        recipe2 = Recipe.objects.create(
+            title='Pancakes',
+            time_minutes=15,
+            price=Decimal('2.50'),
+            user=self.user
+        )
+        recipe1.tags.add(tag1)
+        recipe2.tags.add(tag1, tag2)
+
+        response = self.client.get(TAGS_URL, {'with_counts': 1})
+
+        counts = {item['id']: item['recipe_count'] for item in response.data}
+        self.assertEqual(counts, {tag1.id: 2, tag2.id: 1})
+
+    def test_tag_counts_follow_recipe_changes(self):
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        recipe1 = Recipe.objects.create(
+            title='Stew',
+            time_minutes=60,
+            price=Decimal('6.00'),
+            user=self.user
+        )
+        recipe2 = Recipe.objects.create(
+            title='Pie',
+            time_minutes=50,
+            price=Decimal('5.00'),
+            user=self.user
+        )
+
+        recipe1.tags.add(tag)
+        tag.recipe_set.add(recipe2)
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 2)
+
+        recipe1.tags.clear()
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+
+        recipe2.delete()
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 0)
+
+    def test_malformed_flags_rejected(self):
+        for params in [{'with_counts': 'yes'}, {'assigned_only': 'no'}]:
+            response = self.client.get(TAGS_URL, params)
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST, params
+            )
+            self.assertIn(list(params)[0], response.data)
+
+
+class TagCountConcurrencyTests(TransactionTestCase):
+    def test_concurrent_links_keep_count(self):
+        user = create_user()
+        tag = Tag.objects.create(user=user, name='Dinner')
+        recipe1, recipe2 = [
+            Recipe.objects.create(
+                title=title,
+                time_minutes=30,
+                price=Decimal('4.00'),
+                user=user
+            )
+            for title in ('Stew', 'Pie')
+        ]
+        added = threading.Event()
+        release = threading.Event()
+
+        def add(recipe, hold=False):
+            try:
+                with transaction.atomic():
+                    recipe.tags.add(tag)
+                    if hold:
+                        added.set()
+                        release.wait(5)
+            finally:
+                connections.close_all()
+
+        first = threading.Thread(target=add, args=(recipe1, True))
+        first.start()
+        added.wait(5)
+        # Waits for the tag row the first link change locked
+        second = threading.Thread(target=add, args=(recipe2,))
+        second.start()
+        second.join(0.2)
+        self.assertTrue(second.is_alive())
+        release.set()
+        first.join()
+        second.join()
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 2)
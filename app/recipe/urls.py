@@ -1,6 +1,8 @@
-from django.urls import path, include
+from django.conf import settings
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 
+from core.concurrency import async_view
 from recipe import views
 
 router = DefaultRouter()
@@ -11,6 +13,35 @@ router.register('ingredients', views.IngredientViewSet)
 
 app_name = 'recipe'
 
+
+def async_patterns(patterns):
+    # Under ASGI the router views run in bounded pools instead of a
+    # thread per request; image uploads get a pool of their own
+    return [
+        re_path(
+            pattern.pattern.regex.pattern,
+            async_view(
+                pattern.callback,
+                pool='image' if pattern.name.endswith('upload-image') else 'db'
+            ),
+            name=pattern.name,
+        )
+        for pattern in patterns
+    ]
+
+
+sync_view = views.SyncView.as_view()
+stream_token_view = views.StreamTokenView.as_view()
+router_urls = router.urls
+
+if settings.ASYNC_VIEWS:
+    sync_view = async_view(sync_view)
+    stream_token_view = async_view(stream_token_view)
+    router_urls = async_patterns(router_urls)
+
 urlpatterns = [
-    path('', include(router.urls))
+    path('sync/', sync_view, name='sync'),
+    # Outside /api/recipe/events/, which the proxy sends to the stream
+    path('stream-token/', stream_token_view, name='stream-token'),
+    path('', include(router_urls))
 ]
@@ -1,14 +1,83 @@
+from datetime import datetime, timedelta
+
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
 
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core import signing
+from django.db.models import Exists, OuterRef, Prefetch, Q, Sum
+from django.utils import timezone
+
+from core.db.router import ReplicaReadMixin
+from core.idempotency import idempotent
+from core.metrics import IMAGE_SECONDS
+from core.profiling import ProfilingMixin
+from core.query_budget import QueryBudgetMixin
+from core.timing import ServerTimingMixin
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from recipe import bulk, serializers, sse
+from recipe.similarity import index_cache
+
+
+SPARSE_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return'
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description='Comma separated list of relations (tags, ingredients) '
+                    'to return as objects, others are returned as IDs'
+    ),
+]
+
+
+class BulkActionsMixin:
+    """
+    POST bulk-delete/ and bulk-update/ for the user's objects selected by
+    ID or by filter, run as set-based statements by recipe.bulk.
+    """
+
+    def filter_bulk_queryset(self, queryset, filters):
+        return queryset
+
+    def get_bulk_queryset(self, selection):
+        queryset = self.queryset.model.objects.filter(user=self.request.user)
+        if 'ids' in selection:
+            return queryset.filter(id__in=selection['ids'])
+
+        return self.filter_bulk_queryset(queryset, selection['filter'])
+
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deleted = self.perform_bulk_delete(
+            self.get_bulk_queryset(serializer.validated_data)
+        )
+        return Response({'deleted': deleted})
+
+    @action(methods=['POST'], detail=False, url_path='bulk-update')
+    def bulk_update(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = self.perform_bulk_update(
+            self.get_bulk_queryset(serializer.validated_data),
+            serializer.validated_data['set'],
+        )
+        return Response({'updated': updated})
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -23,16 +92,86 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredients IDs to filter'
             ),
+            *SPARSE_FIELDS_PARAMETERS,
+        ]
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELDS_PARAMETERS),
+    similar=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of similar recipes to return'
+            ),
+        ]
+    ),
+    shopping_list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'recipes',
+                OpenApiTypes.STR,
+                required=True,
+                description='Comma separated list of recipe IDs to combine'
+            ),
+        ]
+    ),
+    batch=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR,
+                required=True,
+                description='Comma separated list of recipe IDs to fetch'
+            ),
+            *SPARSE_FIELDS_PARAMETERS,
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ProfilingMixin, QueryBudgetMixin, ServerTimingMixin,
+                    ReplicaReadMixin, BulkActionsMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     authentication_class = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # Includes the token lookup and the tags/ingredients prefetches
+    query_budgets = {
+        'list': 4,
+        'retrieve': 4,
+        'batch': 4,
+        'similar': 8,
+        'shopping_list': 3,
+    }
+    # Buckets on top of the per-user one, see core.throttling
+    throttle_scopes = {
+        'create': 'recipe_create',
+        'upload_image': 'recipe_upload',
+    }
+    similar_default_limit = 10
+    similar_max_limit = 50
+    shopping_list_max_recipes = 50
+    batch_max_recipes = 200
+    sparse_actions = ['list', 'retrieve', 'batch']
+
+    def _params_to_ints(self, queryset, param=None):
+        try:
+            return [int(str_id) for str_id in queryset.split(',')]
+        except ValueError:
+            raise ValidationError({
+                param or 'ids': 'Expected a comma separated list of IDs.'
+            })
 
-    def _params_to_ints(self, queryset):
-        return [int(str_id) for str_id in queryset.split(',')]  
+    def _required_ids(self, param, max_ids):
+        # Parses a required comma separated ID list, keeping request order
+        value = self.request.query_params.get(param)
+        if not value:
+            raise ValidationError({param: 'This parameter is required.'})
+
+        ids = list(dict.fromkeys(self._params_to_ints(value, param)))
+        if len(ids) > max_ids:
+            raise ValidationError({
+                param: f'At most {max_ids} IDs are allowed.'
+            })
+
+        return ids
 
 
     def get_queryset(self):
@@ -42,39 +181,227 @@ class RecipeViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
 
         if tags:
-            tag_ids = self._params_to_ints(tags)
+            tag_ids = self._params_to_ints(tags, 'tags')
             queryset = queryset.filter(tags__id__in=tag_ids)
 
         if ingredients:
-            ingredients_ids = self._params_to_ints(ingredients)
+            ingredients_ids = self._params_to_ints(ingredients, 'ingredients')
             queryset = queryset.filter(ingredients__id__in=ingredients_ids)
 
-        return queryset.filter(
+        queryset = queryset.filter(
             user=self.request.user
         ).order_by('id').distinct()
 
+        if self.action in self.sparse_actions:
+            queryset = self._apply_sparse_fields(queryset)
+
+        return queryset
+
+    def _split_param(self, param, allowed):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = set(names) - set(allowed)
+        if unknown:
+            raise ValidationError({
+                param: f'Unknown fields: {", ".join(sorted(unknown))}.'
+            })
+
+        return names
+
+    def _sparse_options(self):
+        serializer_class = self.get_serializer_class()
+        return (
+            self._split_param('fields', serializer_class.Meta.fields),
+            self._split_param('expand', serializer_class.expandable_fields),
+        )
+
+    def _apply_sparse_fields(self, queryset):
+        # Loads only the requested columns and prefetches only the
+        # requested relations, as IDs unless they are expanded
+        fields, expand = self._sparse_options()
+        if fields is None:
+            fields = self.get_serializer_class().Meta.fields
+
+        columns = ['id']
+        for name in fields:
+            field = Recipe._meta.get_field(name)
+            if field.concrete and not field.many_to_many:
+                columns.append(name)
+        queryset = queryset.only(*columns)
+
+        for name in self.get_serializer_class().expandable_fields:
+            if name not in fields:
+                continue
+
+            if expand is None or name in expand:
+                queryset = queryset.prefetch_related(name)
+            else:
+                related_model = Recipe._meta.get_field(name).related_model
+                queryset = queryset.prefetch_related(Prefetch(
+                    name, queryset=related_model.objects.only('id')
+                ))
+
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+
+        if self.request is not None and self.action in self.sparse_actions:
+            context['fields'], context['expand'] = self._sparse_options()
+
+        return context
+
     def get_serializer_class(self):
         if self.action == 'list':
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializers
+        elif self.action == 'similar':
+            return serializers.SimilarRecipeSerializer
+        elif self.action == 'shopping_list':
+            return serializers.ShoppingListSerializer
+        elif self.action == 'bulk_delete':
+            return serializers.RecipeBulkDeleteSerializer
+        elif self.action == 'bulk_update':
+            return serializers.RecipeBulkUpdateSerializer
     
         return serializers.RecipeDetailSerializer
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def filter_bulk_queryset(self, queryset, filters):
+        # Any of the given tags and any of the given ingredients, as in list
+        for field in ('tags', 'ingredients'):
+            if field in filters:
+                links = getattr(Recipe, field).through.objects.filter(**{
+                    'recipe_id': OuterRef('pk'),
+                    f'{field[:-1]}_id__in': filters[field],
+                })
+                queryset = queryset.filter(Exists(links))
+
+        return queryset
+
+    def perform_bulk_delete(self, queryset):
+        return bulk.delete_recipes(self.request.user.id, queryset)
+
+    def perform_bulk_update(self, queryset, fields):
+        return bulk.update_recipes(self.request.user.id, queryset, fields)
+
     @action(methods=['POST'], detail=True, url_path='upload-image') #creating a custom action 
+    @idempotent
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
-        if serializer.is_valid():
-            serializer.save()
+        with IMAGE_SECONDS.labels('validate').time():
+            valid = serializer.is_valid()
+
+        if valid:
+            with IMAGE_SECONDS.labels('save').time():
+                serializer.save()
             return Response(serializer.data, status = status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['GET'], detail=True, url_path='similar')
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+
+        try:
+            limit = int(
+                request.query_params.get('limit', self.similar_default_limit)
+            )
+        except ValueError:
+            return Response(
+                {'limit': 'A valid integer is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, self.similar_max_limit))
+
+        scores = index_cache.similar(request.user.id, recipe.id, limit)
+        recipes = Recipe.objects.filter(
+            user=request.user,
+            id__in=[recipe_id for _, recipe_id in scores],
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+
+        results = []
+        for score, recipe_id in scores:
+            similar_recipe = recipes.get(recipe_id)
+            if similar_recipe is not None:
+                similar_recipe.score = score
+                results.append(similar_recipe)
+
+        serializer = self.get_serializer(results, many=True)
+        return Response(serializer.data)
+
+    @action(methods=['GET'], detail=False, url_path='batch')
+    def batch(self, request):
+        ids = self._required_ids('ids', self.batch_max_recipes)
+
+        recipes = self._apply_sparse_fields(Recipe.objects.filter(
+            user=request.user,
+            id__in=ids
+        )).in_bulk()
+
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in ids if recipe_id in recipes],
+            many=True
+        )
+        return Response({
+            'results': serializer.data,
+            'missing': [
+                recipe_id for recipe_id in ids if recipe_id not in recipes
+            ],
+        })
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        recipe_ids = self._required_ids(
+            'recipes', self.shopping_list_max_recipes
+        )
+
+        selected = Recipe.objects.filter(
+            user=request.user,
+            id__in=recipe_ids
+        ).aggregate(
+            found=ArrayAgg('id', ordering='id'),
+            total_price=Sum('price'),
+        )
+
+        # one grouped query over the recipe/ingredient through table
+        rows = Recipe.ingredients.through.objects.filter(
+            recipe__user=request.user,
+            recipe_id__in=recipe_ids,
+        ).values(
+            'ingredient_id', 'ingredient__name'
+        ).annotate(
+            recipe_ids=ArrayAgg('recipe_id', ordering='recipe_id'),
+        ).order_by('ingredient__name', 'ingredient_id')
+
+        ingredients = [
+            {
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'recipes': row['recipe_ids'],
+            }
+            for row in rows
+        ]
+
+        serializer = self.get_serializer({
+            'recipes': selected['found'] or [],
+            'ingredients': ingredients,
+            'total_price': selected['total_price'] or 0,
+        })
+        return Response(serializer.data)
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
@@ -82,40 +409,284 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0,1],
                 description='Filter by items assigned to recipe.'
-            )
+            ),
+            OpenApiParameter(
+                'with_counts',
+                OpenApiTypes.INT, enum=[0,1],
+                description='Include the number of recipes using each item.'
+            ),
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.DestroyModelMixin, 
+class BaseRecipeAttrViewSet(ProfilingMixin,
+                            QueryBudgetMixin,
+                            ServerTimingMixin,
+                            ReplicaReadMixin,
+                            BulkActionsMixin,
+                            mixins.DestroyModelMixin, 
                             mixins.UpdateModelMixin, 
                             mixins.ListModelMixin, 
                             viewsets.GenericViewSet):
-       
-       authentication_classes = [TokenAuthentication]
-       permission_classes = [IsAuthenticated]
-       
-       def get_queryset(self):
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-            )
+
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    query_budgets = {'list': 2}
+
+    def _flag_param(self, param):
+        try:
+            return bool(int(self.request.query_params.get(param, 0)))
+        except ValueError:
+            raise ValidationError({param: 'Expected 0 or 1.'})
+
+    def get_queryset(self):
+        assigned_only = self._flag_param('assigned_only')
 
         queryset = self.queryset
         
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            link_model = queryset.model.recipe_set.through
+            link_field = f'{queryset.model._meta.model_name}_id'
+            queryset = queryset.filter(
+                Exists(link_model.objects.filter(
+                    **{link_field: OuterRef('pk')}
+                ))
+            )
 
         return queryset.filter(
                user=self.request.user
-            ).order_by('-name').distinct()
+            ).order_by('-name')
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self._flag_param('with_counts'):
+            return self.count_serializer_class
+        elif self.action == 'bulk_delete':
+            return serializers.RecipeAttrBulkDeleteSerializer
+        elif self.action == 'bulk_update':
+            return serializers.RecipeAttrBulkUpdateSerializer
+        elif self.action == 'merge':
+            return serializers.RecipeAttrMergeSerializer
+
+        return self.serializer_class
+
+    def filter_bulk_queryset(self, queryset, filters):
+        if 'assigned' in filters:
+            links = queryset.model.recipe_set.through.objects.filter(**{
+                f'{queryset.model._meta.model_name}_id': OuterRef('pk')
+            })
+            assigned = Exists(links)
+            queryset = queryset.filter(
+                assigned if filters['assigned'] else ~assigned
+            )
+
+        return queryset
+
+    def perform_bulk_delete(self, queryset):
+        return bulk.delete_attrs(self.request.user.id, queryset)
+
+    def perform_bulk_update(self, queryset, fields):
+        return bulk.update_attrs(self.request.user.id, queryset, fields)
+
+    @action(methods=['POST'], detail=True, url_path='merge')
+    def merge(self, request, pk=None):
+        # Merges the sources into this object, see recipe.bulk.merge_attrs
+        target = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        sources = [
+            source for source in serializer.validated_data['sources']
+            if source != target.pk
+        ]
+        known = self.queryset.filter(
+            user=request.user, id__in=sources
+        ).values_list('id', flat=True)
+        unknown = sorted(set(sources) - set(known))
+        if unknown:
+            raise ValidationError({
+                'sources': f'Unknown IDs: {", ".join(map(str, unknown))}.'
+            })
+
+        merged = bulk.merge_attrs(
+            request.user.id,
+            target,
+            sources,
+            serializer.validated_data.get('name'),
+        )
+        target.refresh_from_db()
+        return Response({
+            **self.count_serializer_class(target).data, 'merged': merged,
+        })
 
 
 class TagViewSets(BaseRecipeAttrViewSet):
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
    
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
-    
-   
\ No newline at end of file
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            'since',
+            OpenApiTypes.STR,
+            description='Sync token returned by the previous sync call'
+        ),
+        OpenApiParameter(
+            'limit',
+            OpenApiTypes.INT,
+            description='Maximum number of changes to return'
+        ),
+    ],
+    responses=OpenApiTypes.OBJECT,
+)
+class SyncView(ProfilingMixin, QueryBudgetMixin, APIView):
+    # Returns what changed since the client's last sync token, in pages
+    # ordered by (changed_at, stream, id)
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # One query per stream, then one per changed model and the prefetches
+    query_budgets = {'get': 11}
+    token_salt = 'recipe.sync'
+    streams = [
+        ('tags', Tag, 'updated_at'),
+        ('ingredients', Ingredient, 'updated_at'),
+        ('recipes', Recipe, 'updated_at'),
+        ('deleted', Tombstone, 'deleted_at'),
+    ]
+
+    def _encode_token(self, changed_at, position, pk, started_at):
+        # started_at is where the sync this page belongs to began, pages
+        # run oldest first so the position can be far older than that
+        return signing.dumps(
+            [changed_at.isoformat(), position, pk, started_at.isoformat()],
+            salt=self.token_salt
+        )
+
+    def _decode_token(self, token):
+        try:
+            changed_at, position, pk, *started_at = signing.loads(
+                token, salt=self.token_salt
+            )
+            cursor = datetime.fromisoformat(changed_at), int(position), int(pk)
+            # Tokens issued before started_at was added
+            started_at = started_at[0] if started_at else changed_at
+            return cursor, datetime.fromisoformat(started_at)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise ValidationError({'since': 'Invalid sync token.'})
+
+    def _changes(self, position, model, field, cursor, until, limit):
+        queryset = model.objects.filter(
+            user=self.request.user,
+            **{f'{field}__lte': until}
+        )
+
+        if cursor is not None:
+            changed_at, cursor_position, cursor_id = cursor
+            if position < cursor_position:
+                queryset = queryset.filter(**{f'{field}__gt': changed_at})
+            elif position == cursor_position:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': changed_at}) |
+                    Q(**{field: changed_at, 'id__gt': cursor_id})
+                )
+            else:
+                queryset = queryset.filter(**{f'{field}__gte': changed_at})
+
+        rows = queryset.order_by(field, 'id').values_list(field, 'id')
+        return [(changed_at, position, pk) for changed_at, pk in rows[:limit]]
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        cursor, started_at = (
+            self._decode_token(since) if since else (None, timezone.now())
+        )
+
+        # Tombstones from before the sync began may have been pruned
+        retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        if started_at < timezone.now() - retention:
+            return Response(
+                {'since': 'Sync token expired, a full sync is required.'},
+                status=status.HTTP_410_GONE
+            )
+
+        try:
+            limit = int(
+                request.query_params.get('limit', settings.SYNC_PAGE_SIZE)
+            )
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        limit = max(1, min(limit, settings.SYNC_MAX_PAGE_SIZE))
+
+        # Rows written in the last few seconds may belong to transactions
+        # that have not committed yet, leave them for the next sync
+        until = timezone.now() - timedelta(
+            seconds=settings.SYNC_SETTLE_SECONDS
+        )
+
+        rows = []
+        for position, (_, model, field) in enumerate(self.streams):
+            rows.extend(
+                self._changes(position, model, field, cursor, until, limit + 1)
+            )
+        rows.sort()
+
+        has_more = len(rows) > limit
+        page = rows[:limit]
+        if has_more:
+            next_token = self._encode_token(*page[-1], started_at)
+        else:
+            next_token = self._encode_token(
+                until, len(self.streams), 0, until
+            )
+
+        ids = {name: [] for name, _, _ in self.streams}
+        for _, position, pk in page:
+            ids[self.streams[position][0]].append(pk)
+
+        context = {'request': request}
+        recipes = Recipe.objects.filter(
+            id__in=ids['recipes']
+        ).prefetch_related('tags', 'ingredients').order_by('id')
+        tags = Tag.objects.filter(id__in=ids['tags']).order_by('id')
+        ingredients = Ingredient.objects.filter(
+            id__in=ids['ingredients']
+        ).order_by('id')
+        deleted = Tombstone.objects.filter(
+            id__in=ids['deleted']
+        ).order_by('id').values_list('kind', 'object_id')
+
+        return Response({
+            'recipes': serializers.RecipeDetailSerializer(
+                recipes, many=True, context=context
+            ).data,
+            'tags': serializers.TagSerializer(tags, many=True).data,
+            'ingredients': serializers.IngredientSerializer(
+                ingredients, many=True
+            ).data,
+            'deleted': [
+                {'kind': kind, 'id': object_id}
+                for kind, object_id in deleted
+            ],
+            'next': next_token,
+            'has_more': has_more,
+        })
+
+
+@extend_schema(request=None, responses=OpenApiTypes.OBJECT)
+class StreamTokenView(APIView):
+    # Issues the short-lived token browsers pass as ?token= to the event
+    # stream, since EventSource cannot send an Authorization header
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        return Response({
+            'token': sse.issue_stream_token(request.user.id),
+            'expires_in': settings.RECIPE_EVENTS_TOKEN_MAX_AGE,
+        })
@@ -0,0 +1,112 @@
+"""
+Account deletion in two steps.
+
+request_deletion() disables the account at once: the user can no longer
+log in, their token is revoked and deletion_requested_at is set. The
+data is then purged by `manage.py purge_users --interval N`, which the
+purger service of docker-compose-deploy.yml runs next to the app. Web
+workers are recycled by uwsgi's max-requests and reload-on-rss, so a
+purge is not run in them. Each pass purges every pending user,
+USER_PURGE_CHUNK_SIZE rows per transaction, so no statement holds locks
+on a large user's rows for long and no more than a chunk of IDs is held
+in memory. Deleting the user row through the ORM would instead load
+every recipe and run the recipe signal handlers one by one.
+
+Recipes, tags and ingredients are deleted with plain SQL, without
+tombstones, events or recipe count updates, since nobody is left to
+see them. Recipe images are removed from storage after each chunk
+commits. Committed chunks stay deleted, so a purge that is interrupted
+resumes where it stopped on the next pass.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import Ingredient, Recipe, Tag, Tombstone
+from recipe.similarity import index_cache
+
+
+def request_deletion(user):
+    get_user_model().objects.filter(pk=user.pk).update(
+        is_active=False, deletion_requested_at=timezone.now()
+    )
+    Token.objects.filter(user_id=user.pk).delete()
+
+
+def _delete_images(names):
+    storage = Recipe._meta.get_field('image').storage
+    for name in names:
+        storage.delete(name)
+
+
+def _delete_in_chunks(model, user_id, chunk_size, links=(), returning=None):
+    # Deletes the user's rows of model, with their m2m links, a chunk per
+    # transaction and returns the number of rows deleted
+    table = model._meta.db_table
+    deleted = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {table} WHERE user_id = %s '
+                f'ORDER BY id LIMIT %s FOR UPDATE',
+                [user_id, chunk_size],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return deleted
+
+            for link_table, column in links:
+                cursor.execute(
+                    f'DELETE FROM {link_table} WHERE {column} = ANY(%s)',
+                    [ids],
+                )
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id = ANY(%s) '
+                f'RETURNING {returning or "id"}',
+                [ids],
+            )
+            if returning:
+                names = [row[0] for row in cursor.fetchall() if row[0]]
+                transaction.on_commit(partial(_delete_images, names))
+            deleted += len(ids)
+
+
+def purge_user(user_id, chunk_size=None):
+    """Delete a user and everything they own, returning row counts."""
+    chunk_size = chunk_size or settings.USER_PURGE_CHUNK_SIZE
+    recipe_tags = Recipe.tags.through._meta.db_table
+    recipe_ingredients = Recipe.ingredients.through._meta.db_table
+
+    counts = {
+        'recipes': _delete_in_chunks(
+            Recipe, user_id, chunk_size,
+            links=[(recipe_tags, 'recipe_id'),
+                   (recipe_ingredients, 'recipe_id')],
+            returning='image',
+        ),
+        'tags': _delete_in_chunks(
+            Tag, user_id, chunk_size, links=[(recipe_tags, 'tag_id')]
+        ),
+        'ingredients': _delete_in_chunks(
+            Ingredient, user_id, chunk_size,
+            links=[(recipe_ingredients, 'ingredient_id')],
+        ),
+        'tombstones': _delete_in_chunks(Tombstone, user_id, chunk_size),
+    }
+    index_cache.discard(user_id)
+
+    # Only small related rows are left for the collector
+    get_user_model().objects.filter(pk=user_id).delete()
+    return counts
+
+
+def pending_user_ids():
+    return list(
+        get_user_model().objects.filter(
+            deletion_requested_at__isnull=False
+        ).order_by('deletion_requested_at').values_list('id', flat=True)
+    )
@@ -0,0 +1,140 @@
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Ingredient, Recipe, Tag, Tombstone
+from user.deletion import pending_user_ids, purge_user, request_deletion
+
+
+def create_user(email='user@example.com'):
+    return get_user_model().objects.create_user(
+        email=email, password='pass123'
+    )
+
+
+def create_recipes(user, count):
+    tag = Tag.objects.create(user=user, name='Vegan')
+    ingredient = Ingredient.objects.create(user=user, name='Kale')
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            user=user,
+            title=f'Recipe {index}',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        recipes.append(recipe)
+
+    return recipes
+
+
+class AdminDeleteUserTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(get_user_model().objects.create_superuser(
+            email='admin@example.com', password='pass123'
+        ))
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        create_recipes(self.user, 2)
+
+    def assert_deletion_requested(self):
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deletion_requested_at)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertEqual(pending_user_ids(), [self.user.id])
+        # Left for the purger
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_delete_view_requests_deletion(self):
+        response = self.client.post(
+            reverse('admin:core_user_delete', args=[self.user.id]),
+            {'post': 'yes'},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assert_deletion_requested()
+
+    def test_delete_action_requests_deletion(self):
+        response = self.client.post(reverse('admin:core_user_changelist'), {
+            'action': 'delete_selected',
+            '_selected_action': [self.user.id],
+            'post': 'yes',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assert_deletion_requested()
+
+
+class PurgeUserTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_purge_in_chunks(self):
+        user = create_user()
+        recipes = create_recipes(user, 5)
+        recipes[0].image.save('soup.jpg', ContentFile(b'image'))
+        image_name = recipes[0].image.name
+        storage = recipes[0].image.storage
+        recipes[1].delete()
+
+        other = create_user(email='other@example.com')
+        other_recipe = create_recipes(other, 1)[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = purge_user(user.id, chunk_size=2)
+
+        self.assertEqual(counts, {
+            'recipes': 4, 'tags': 1, 'ingredients': 1, 'tombstones': 1,
+        })
+        self.assertFalse(get_user_model().objects.filter(pk=user.id).exists())
+        self.assertFalse(storage.exists(image_name))
+        self.assertFalse(Tombstone.objects.filter(user_id=user.id).exists())
+        self.assertEqual(list(Recipe.objects.all()), [other_recipe])
+        self.assertEqual(Recipe.tags.through.objects.count(), 1)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 1)
+
+    def test_purge_users_command(self):
+        pending = create_user()
+        create_recipes(pending, 2)
+        request_deletion(pending)
+        active = create_user(email='active@example.com')
+        out = StringIO()
+
+        call_command('purge_users', stdout=out)
+
+        self.assertEqual(
+            list(get_user_model().objects.values_list('id', flat=True)),
+            [active.id],
+        )
+        self.assertIn(f'user {pending.id}: 2 recipes', out.getvalue())
+        self.assertIn('Purged 1 user(s)', out.getvalue())
+
+    @patch('core.management.commands.purge_users.close_old_connections')
+    @patch('core.management.commands.purge_users.time.sleep',
+           side_effect=KeyboardInterrupt)
+    def test_purge_users_keeps_polling(self, patched_sleep, patched_close):
+        request_deletion(create_user())
+
+        with self.assertRaises(KeyboardInterrupt):
+            call_command('purge_users', interval=30, stdout=StringIO())
+
+        # Sleeps once a pass finds nobody left to purge
+        patched_sleep.assert_called_once_with(30)
+        self.assertFalse(get_user_model().objects.exists())
@@ -2,20 +2,28 @@ from rest_framework import generics, authentication, permissions
 from rest_framework.authtoken.views import ObtainAuthToken 
 from rest_framework.settings import api_settings
 
+from core.db.router import ReplicaReadMixin
+from core.profiling import ProfilingMixin
+from core.query_budget import QueryBudgetMixin
+from core.timing import ServerTimingMixin
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(ProfilingMixin, QueryBudgetMixin, ServerTimingMixin,
+                     generics.CreateAPIView):
     serializer_class = UserSerializer
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(ProfilingMixin, QueryBudgetMixin, ServerTimingMixin,
+                      ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     rendered_classes = api_settings.DEFAULT_RENDERER_CLASSES 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ProfilingMixin, QueryBudgetMixin, ServerTimingMixin,
+                     ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    query_budgets = {'get': 1}
 
 
     def get_object(self):
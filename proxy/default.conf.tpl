@@ -5,6 +5,26 @@ server {
         alias /vol/static;
     }
 
+    location /api/recipe/events/ {
+        proxy_pass              http://${EVENTS_HOST}:${EVENTS_PORT};
+        proxy_http_version      1.1;
+        proxy_set_header        Host $host;
+        proxy_set_header        Connection '';
+        proxy_buffering         off;
+        proxy_read_timeout      1h;
+    }
+
+    # Scraped from inside the network only
+    location = /metrics {
+        allow                   127.0.0.1;
+        allow                   10.0.0.0/8;
+        allow                   172.16.0.0/12;
+        allow                   192.168.0.0/16;
+        deny                    all;
+        uwsgi_pass              ${APP_HOST}:${APP_PORT};
+        include                 /etc/nginx/uwsgi_params;
+    }
+
     location / {
         uwsgi_pass              ${APP_HOST}:${APP_PORT};
         include                 /etc/nginx/uwsgi_params;
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Slow-client benchmark for comparing the uwsgi and ASGI profiles.
+
+Holds --slow connections open that trickle their request headers one
+byte every --trickle seconds, while --fast clients send normal requests
+back to back. The fast clients' throughput and latency percentiles are
+printed as JSON.
+
+Point it at the app server itself, nginx buffers requests before they
+reach uwsgi or uvicorn:
+
+    uwsgi --http-socket :9000 --workers 4 --master --enable-threads \\
+        --module app.wsgi
+    APP_SERVER=asgi uvicorn app.asgi:application --port 9000 --workers 4
+
+    python bench_slow_clients.py --url http://127.0.0.1:9000/api/recipe/tags/ \\
+        --token <api token> --slow 200 --fast 20 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def build_request(url, token):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += f'?{parts.query}'
+
+    lines = [
+        f'GET {path} HTTP/1.1',
+        f'Host: {parts.hostname}',
+        'Connection: close',
+    ]
+    if token:
+        lines.append(f'Authorization: Token {token}')
+
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+
+async def slow_client(host, port, request, trickle, deadline):
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(trickle)
+            continue
+
+        try:
+            for byte in request:
+                if time.monotonic() >= deadline:
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(trickle)
+            await reader.read()
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+
+async def fast_client(host, port, request, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status = await reader.readline()
+            await reader.read()
+            writer.close()
+        except OSError:
+            errors.append('connect')
+            continue
+
+        if b' 200 ' in status:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(status.decode(errors='replace').strip())
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def run(args):
+    parts = urlsplit(args.url)
+    host, port = parts.hostname, parts.port or 80
+    request = build_request(args.url, args.token)
+    deadline = time.monotonic() + args.duration
+    latencies, errors = [], []
+
+    await asyncio.gather(
+        *[
+            slow_client(host, port, request, args.trickle, deadline)
+            for _ in range(args.slow)
+        ],
+        *[
+            fast_client(host, port, request, deadline, latencies, errors)
+            for _ in range(args.fast)
+        ],
+    )
+
+    return {
+        'url': args.url,
+        'slow_clients': args.slow,
+        'fast_clients': args.fast,
+        'duration': args.duration,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'req_per_s': round(len(latencies) / args.duration, 2),
+        'latency_ms': {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in [
+                ('p50', percentile(latencies, 50)),
+                ('p95', percentile(latencies, 95)),
+                ('p99', percentile(latencies, 99)),
+                ('mean', statistics.mean(latencies) if latencies else None),
+            ]
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--token')
+    parser.add_argument('--slow', type=int, default=100)
+    parser.add_argument('--fast', type=int, default=10)
+    parser.add_argument('--trickle', type=float, default=1.0)
+    parser.add_argument('--duration', type=float, default=30)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Benchmark for validating the derived uwsgi worker and thread defaults.
+
+Starts uwsgi once per candidate with an ini from `manage.py uwsgi_config`,
+drives it with --clients concurrent clients for --duration seconds and
+prints throughput, latency percentiles and the RSS of the master and its
+workers as JSON. "auto" is the configuration run.sh would use, "WxT"
+overrides the worker and thread counts.
+
+Run it from the app directory against a seeded database (see
+`manage.py seed_data`), inside a container with the production limits:
+
+    python /scripts/bench_uwsgi_config.py \\
+        --url http://127.0.0.1:9100/api/recipe/recipes/ --token <api token> \\
+        --candidates auto,2x1,4x2,8x2 --clients 32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+from bench_slow_clients import build_request, fast_client, percentile
+
+
+def parse_candidate(candidate):
+    if candidate == 'auto':
+        return {}
+    workers, _, threads = candidate.partition('x')
+    return {'workers': int(workers), 'threads': int(threads or 1)}
+
+
+def process_tree(pid):
+    pids = [pid]
+    for child in pids:
+        try:
+            with open(f'/proc/{child}/task/{child}/children') as children:
+                pids.extend(int(each) for each in children.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0
+
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f'uwsgi did not listen on {host}:{port}')
+
+
+def write_ini(args, host, port, overrides, path):
+    command = [
+        sys.executable, args.manage, 'uwsgi_config',
+        '--http-socket', f'{host}:{port}', '--output', path,
+    ]
+    for name, value in overrides.items():
+        command += [f'--{name}', str(value)]
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+    with open(path) as ini:
+        options = dict(
+            line.split(' = ', 1) for line in ini.read().splitlines()
+            if ' = ' in line
+        )
+    return int(options['workers']), int(options['threads'])
+
+
+async def load(host, port, request, clients, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*[
+        fast_client(host, port, request, deadline, latencies, errors)
+        for _ in range(clients)
+    ])
+    return latencies, errors
+
+
+def bench(args, candidate, ini_path):
+    parts = urlsplit(args.url)
+    host, port = parts.hostname, parts.port or 80
+    request = build_request(args.url, args.token)
+    workers, threads = write_ini(
+        args, host, port, parse_candidate(candidate), ini_path
+    )
+
+    server = subprocess.Popen(
+        ['uwsgi', '--ini', ini_path, '--disable-logging'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(host, port, args.boot_timeout)
+        asyncio.run(load(host, port, request, args.clients, args.warmup))
+        latencies, errors = asyncio.run(
+            load(host, port, request, args.clients, args.duration)
+        )
+        # Sampled after the run, cheaper mode may already have idled workers
+        pids = process_tree(server.pid)
+        rss = [rss_mb(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        'candidate': candidate,
+        'workers': workers,
+        'threads': threads,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'req_per_s': round(len(latencies) / args.duration, 2),
+        'latency_ms': {
+            name: round(value * 1000, 2) if value is not None else None
+            for name, value in [
+                ('p50', percentile(latencies, 50)),
+                ('p95', percentile(latencies, 95)),
+                ('p99', percentile(latencies, 99)),
+                ('mean', statistics.mean(latencies) if latencies else None),
+            ]
+        },
+        'processes': len(pids),
+        'rss_mb': round(sum(rss), 1),
+        'max_worker_rss_mb': round(max(rss[1:] or [0]), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--token')
+    parser.add_argument('--candidates', default='auto,2x1,4x2,8x2')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--boot-timeout', type=float, default=30)
+    parser.add_argument('--manage', default='manage.py')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        ini_path = os.path.join(directory, 'uwsgi.ini')
+        for candidate in args.candidates.split(','):
+            results.append(bench(args, candidate.strip(), ini_path))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,26 @@
 
 set -e 
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput 
-python manage.py migrate
+# Waits for the database, then migrates and collects static files
+# concurrently, skipping whichever has nothing to do
+python manage.py startup
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
+# Workers write their metrics here for /metrics to aggregate, samples
+# from a previous run must not be summed in
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/vol/metrics}"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"/*
+
+if [ "$APP_SERVER" = "asgi" ]; then
+    exec uvicorn app.asgi:application --host 0.0.0.0 --port 9000 \
+        --workers "${ASGI_WORKERS:-4}" --no-access-log
+fi
+
+# Workers and threads are sized from the container's CPU quota and
+# memory limit, see core/server_config.py for the UWSGI_* overrides.
+# The image has no /tmp, the ini goes to a directory it creates
+python manage.py uwsgi_config --output /vol/uwsgi/uwsgi.ini
+
+# Without --lazy-apps the master imports app.wsgi once and forks the
+# workers after it, so they share the loaded modules (see app/wsgi.py)
+exec uwsgi --ini /vol/uwsgi/uwsgi.ini
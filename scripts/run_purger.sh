@@ -0,0 +1,9 @@
+#!/bin/sh
+
+set -e
+
+python manage.py wait_for_db
+
+# Purges the data of deleted users, including purges a restart
+# interrupted, see app/user/deletion.py
+exec python manage.py purge_users --interval "${USER_PURGE_INTERVAL:-60}"